@@ -4,7 +4,9 @@ Blocks Module
 This module contains the block-related classes for the FlipperScriptStudio application.
 """
 
-from .base_block import BaseBlock, BlockConnector
-from .block_factory import BlockFactory
+from .base_block import BaseBlock, BlockConnector, connector_type_code
+from .block_factory import BlockFactory, validate_connections
+from .connector_index import ConnectorIndex
 
-__all__ = ['BaseBlock', 'BlockConnector', 'BlockFactory']
\ No newline at end of file
+__all__ = ['BaseBlock', 'BlockConnector', 'BlockFactory', 'ConnectorIndex',
+           'connector_type_code', 'validate_connections']
\ No newline at end of file
@@ -4,9 +4,88 @@ Base Block Module
 This module defines the base class for all visual blocks in the FlipperScriptStudio application.
 """
 
+import math
+import sys
+from contextlib import contextmanager
+
 from PyQt6.QtCore import Qt, QRectF, QPointF, pyqtSignal, QObject
-from PyQt6.QtGui import QColor, QPen, QBrush, QPainter, QPainterPath
-from PyQt6.QtWidgets import QGraphicsItem, QGraphicsObject, QGraphicsTextItem, QGraphicsRectItem
+from PyQt6.QtGui import QColor, QPen, QBrush, QPainter, QPainterPath, QFont, QStaticText, QTransform, QPicture
+from PyQt6.QtWidgets import QGraphicsItem, QGraphicsObject, QGraphicsRectItem
+
+
+def _connector_styles():
+    """
+    Build the (brush, pen) pairs used to paint connectors.
+    
+    Returns:
+        dict: Mapping of (connector kind, state) to a (QBrush, QPen) tuple
+    """
+    base_colors = {
+        "flow": QColor(50, 150, 250),  # Blue for flow
+        "data": QColor(250, 180, 50)   # Orange for data
+    }
+    
+    styles = {}
+    for kind, base_color in base_colors.items():
+        styles[(kind, "normal")] = (QBrush(base_color), QPen(base_color.darker(120), 1.5))
+        styles[(kind, "hover")] = (QBrush(base_color.lighter(110)), QPen(base_color.lighter(130), 1.5))
+        styles[(kind, "connected")] = (QBrush(base_color.darker(110)), QPen(base_color.darker(130), 1.5))
+    return styles
+
+
+_BLOCK_FONT = None
+
+# Sentinel for properties that have not been set yet
+_MISSING = object()
+
+# Interned connector type names mapped to small integer codes
+_CONNECTOR_TYPE_CODES = {}
+
+
+def connector_type_code(connector_type):
+    """
+    Get the integer code for a connector type, assigning one if it is new.
+    
+    Args:
+        connector_type: Connector type name
+        
+    Returns:
+        int: Code shared by all connectors of this type
+    """
+    code = _CONNECTOR_TYPE_CODES.get(connector_type)
+    if code is None:
+        code = _CONNECTOR_TYPE_CODES[sys.intern(connector_type)] = len(_CONNECTOR_TYPE_CODES)
+    return code
+
+
+def _block_font():
+    """
+    Get the font used for block titles and connector labels, created on first use.
+    
+    Returns:
+        QFont: Shared block font
+    """
+    global _BLOCK_FONT
+    if _BLOCK_FONT is None:
+        _BLOCK_FONT = QFont()
+    return _BLOCK_FONT
+
+
+def _static_label(text, text_width=-1):
+    """
+    Build a laid-out static text for a block title or connector label.
+    
+    Args:
+        text: Label text
+        text_width: Wrap width, or -1 for no wrapping
+        
+    Returns:
+        QStaticText: Prepared static text
+    """
+    static = QStaticText(text)
+    static.setTextWidth(text_width)
+    static.prepare(QTransform(), _block_font())
+    return static
 
 
 class BlockConnector(QGraphicsObject):
@@ -16,6 +95,9 @@ class BlockConnector(QGraphicsObject):
     
     connectionChanged = pyqtSignal(object, object)  # Emitted when connection status changes
     
+    # Brushes and pens for every connector kind/state, built once
+    _STYLES = _connector_styles()
+    
     def __init__(self, parent=None, connector_id="", connector_type="", is_input=True):
         """
         Initialize a new block connector.
@@ -29,56 +111,85 @@ class BlockConnector(QGraphicsObject):
         super().__init__(parent)
         self.connector_id = connector_id
         self.connector_type = connector_type
+        self.connector_type_code = connector_type_code(connector_type)
         self.is_input = is_input
-        self.connected_to = None
         self.setAcceptHoverEvents(True)
         self.hover = False
         
+        # While idle the parent block draws this connector, so the item itself
+        # only paints when hovered or connected
+        self._idle = True
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemHasNoContents, True)
+        self.connected_to = None
+        
         # Set size and appearance
         self.radius = 6
+        self._bounding_rect = QRectF(-self.radius, -self.radius,
+                                     self.radius * 2, self.radius * 2)
         self.setZValue(1)  # Ensure connectors are drawn above blocks
         
+        # Cache the rendered connector; hover/connection changes call update()
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
+        
+    @property
+    def connected_to(self):
+        """The connector this one is connected to, or None."""
+        return self._connected_to
+    
+    @connected_to.setter
+    def connected_to(self, other_connector):
+        self._connected_to = other_connector
+        self._sync_contents()
+        
+    def _sync_contents(self):
+        """Switch painting between this item and the parent block's idle drawing."""
+        idle = not self._connected_to and not self.hover
+        if idle == self._idle:
+            return
+        self._idle = idle
+        
+        if idle:
+            # Repaint the area before the item stops painting
+            self.update()
+            self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemHasNoContents, True)
+        else:
+            self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemHasNoContents, False)
+            self.update()
+        
     def boundingRect(self):
         """Define the bounding rectangle for the connector."""
-        return QRectF(-self.radius, -self.radius, 
-                     self.radius * 2, self.radius * 2)
+        return self._bounding_rect
     
     def paint(self, painter, option, widget):
         """Paint the connector."""
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
         
-        # Set color based on connector type and state
-        if self.connector_type == "flow":
-            base_color = QColor(50, 150, 250)  # Blue for flow
-        else:
-            base_color = QColor(250, 180, 50)  # Orange for data
-            
+        # Pick the style based on connector type and state
+        kind = "flow" if self.connector_type == "flow" else "data"
         if self.connected_to:
-            # Connected state
-            painter.setBrush(QBrush(base_color.darker(110)))
-            painter.setPen(QPen(base_color.darker(130), 1.5))
+            state = "connected"
         elif self.hover:
-            # Hover state
-            painter.setBrush(QBrush(base_color.lighter(110)))
-            painter.setPen(QPen(base_color.lighter(130), 1.5))
+            state = "hover"
         else:
-            # Normal state
-            painter.setBrush(QBrush(base_color))
-            painter.setPen(QPen(base_color.darker(120), 1.5))
+            state = "normal"
             
+        brush, pen = self._STYLES[(kind, state)]
+        painter.setBrush(brush)
+        painter.setPen(pen)
+        
         # Draw the connector circle
-        painter.drawEllipse(self.boundingRect())
+        painter.drawEllipse(self._bounding_rect)
         
     def hoverEnterEvent(self, event):
         """Handle hover enter events."""
         self.hover = True
-        self.update()
+        self._sync_contents()
         super().hoverEnterEvent(event)
         
     def hoverLeaveEvent(self, event):
         """Handle hover leave events."""
         self.hover = False
-        self.update()
+        self._sync_contents()
         super().hoverLeaveEvent(event)
         
     def mousePressEvent(self, event):
@@ -111,7 +222,7 @@ class BlockConnector(QGraphicsObject):
             return False
             
         # Check if connector types are compatible
-        if self.connector_type != other_connector.connector_type:
+        if self.connector_type_code != other_connector.connector_type_code:
             return False
             
         # Disconnect any existing connections
@@ -148,6 +259,15 @@ class BaseBlock(QGraphicsObject):
     blockSelected = pyqtSignal(object, bool)  # Emitted when block is selected/deselected
     propertyChanged = pyqtSignal(object, str, object)  # Emitted when a property changes
     
+    # Border pen drawn over the recorded chrome while selected
+    _SELECTED_PEN = QPen(Qt.GlobalColor.white, 2)
+    
+    # Horizontal room outside the body for the connector circles drawn by the block
+    CONNECTOR_MARGIN = 8
+    
+    # Snap grid for block positions; half of the canvas grid so blocks line up with it
+    GRID_SIZE = 10
+    
     def __init__(self, block_id="", block_type="", title="", color=None):
         """
         Initialize a new block.
@@ -160,7 +280,7 @@ class BaseBlock(QGraphicsObject):
         """
         super().__init__()
         self.block_id = block_id
-        self.block_type = block_type
+        self.block_type = sys.intern(block_type)
         self.title = title
         self.color = color or QColor(100, 100, 100)
         self.selected = False
@@ -169,55 +289,134 @@ class BaseBlock(QGraphicsObject):
         self.header_height = 24
         self.corner_radius = 8
         
+        # Cached painting resources (rebuilt when geometry changes)
+        self._body_path = None
+        self._header_path = None
+        self._paths_dirty = True
+        self._chrome = None
+        self._body_brush = QBrush(self.color)
+        self._header_brush = QBrush(self.color.darker(120))
+        self._border_pen = QPen(self.color.darker(150), 1.5)
+        
+        # Batch state: layout, geometry and repaints are deferred until end_batch()
+        self._in_batch = False
+        self._pending_layout = []
+        
         # Enable item flags
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable)
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable)
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges)
         self.setAcceptHoverEvents(True)
         
+        # Cache the rendered block so pans and unrelated repaints blit a pixmap
+        # instead of re-running paint(). ItemCoordinateCache is the alternative
+        # if heavily zoomed-in views show the device cache being re-rendered.
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
+        
         # Create title text
-        self.title_item = QGraphicsTextItem(self.title, self)
-        self.title_item.setDefaultTextColor(Qt.GlobalColor.white)
-        self.title_item.setPos(10, 4)
-        self.title_item.setTextWidth(self.width - 20)
+        self._title_static = _static_label(self.title, self.width - 28)
         
         # Initialize connectors
         self.input_connectors = {}
         self.output_connectors = {}
         
+        # Connector labels as (position, static text) pairs drawn in paint()
+        self._input_labels = []
+        self._output_labels = []
+        
+        # Idle connector circles as (rect, brush, pen) drawn in paint()
+        self._connector_marks = []
+        
         # Properties dictionary
         self.properties = {}
         
     def boundingRect(self):
-        """Define the bounding rectangle for the block."""
-        return QRectF(0, 0, self.width, self.height)
+        """Define the bounding rectangle for the block, including connector circles."""
+        margin = self.CONNECTOR_MARGIN
+        return QRectF(-margin, 0, self.width + margin * 2, self.height)
     
-    def paint(self, painter, option, widget):
-        """Paint the block."""
+    def shape(self):
+        """Limit hit-testing and selection to the block body."""
+        if self._paths_dirty:
+            self._rebuild_paths()
+        return self._body_path
+    
+    def _rebuild_paths(self):
+        """Rebuild the cached body and header paths from the block geometry."""
+        # Block body
+        self._body_path = QPainterPath()
+        self._body_path.addRoundedRect(0, 0, self.width, self.height, 
+                                       self.corner_radius, self.corner_radius)
+        
+        # Header section
+        self._header_path = QPainterPath()
+        self._header_path.addRoundedRect(0, 0, self.width, self.header_height, 
+                                         self.corner_radius, self.corner_radius)
+        self._header_path.addRect(0, self.header_height - self.corner_radius, 
+                                  self.width, self.corner_radius)
+        
+        self._paths_dirty = False
+        self._chrome = None
+        
+    def _rebuild_chrome(self):
+        """Record the body, header, border and idle connectors into a QPicture."""
+        if self._paths_dirty:
+            self._rebuild_paths()
+            
+        picture = QPicture()
+        painter = QPainter(picture)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
         
-        # Draw block body
-        path = QPainterPath()
-        path.addRoundedRect(0, 0, self.width, self.height, 
-                           self.corner_radius, self.corner_radius)
+        # Fill body and header
+        painter.fillPath(self._body_path, self._body_brush)
+        painter.fillPath(self._header_path, self._header_brush)
         
-        # Fill with block color
-        painter.fillPath(path, QBrush(self.color))
+        # Draw border
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        painter.setPen(self._border_pen)
+        painter.drawPath(self._body_path)
         
-        # Draw header section
-        header_path = QPainterPath()
-        header_path.addRoundedRect(0, 0, self.width, self.header_height, 
-                                  self.corner_radius, self.corner_radius)
-        header_path.addRect(0, self.header_height - self.corner_radius, 
-                           self.width, self.corner_radius)
-        painter.fillPath(header_path, QBrush(self.color.darker(120)))
+        # Draw idle connectors; hovered or connected ones paint themselves on top
+        self._draw_connector_marks(painter)
         
-        # Draw border
+        painter.end()
+        self._chrome = picture
+        
+    def _draw_connector_marks(self, painter):
+        """
+        Draw the idle connector circles.
+        
+        Args:
+            painter: Painter to draw with
+        """
+        for rect, brush, pen in self._connector_marks:
+            painter.setBrush(brush)
+            painter.setPen(pen)
+            painter.drawEllipse(rect)
+    
+    def paint(self, painter, option, widget):
+        """Paint the block."""
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        
+        if self._chrome is None or self._paths_dirty:
+            self._rebuild_chrome()
+        painter.drawPicture(0, 0, self._chrome)
+        
+        # Selection border goes over the recorded one, below the connectors
         if self.isSelected():
-            painter.setPen(QPen(Qt.GlobalColor.white, 2))
-        else:
-            painter.setPen(QPen(self.color.darker(150), 1.5))
-        painter.drawPath(path)
+            painter.setBrush(Qt.BrushStyle.NoBrush)
+            painter.setPen(self._SELECTED_PEN)
+            painter.drawPath(self._body_path)
+            self._draw_connector_marks(painter)
+        
+        # Draw title and connector labels
+        painter.setPen(Qt.GlobalColor.white)
+        painter.setFont(_block_font())
+        painter.drawStaticText(QPointF(14, 8), self._title_static)
+        for pos, static in self._input_labels:
+            painter.drawStaticText(pos, static)
+        for pos, static in self._output_labels:
+            painter.drawStaticText(pos, static)
         
     def add_input_connector(self, connector_id, connector_type, description=""):
         """
@@ -231,21 +430,9 @@ class BaseBlock(QGraphicsObject):
         connector = BlockConnector(self, connector_id, connector_type, True)
         self.input_connectors[connector_id] = connector
         
-        # Position the connector on the left side of the block
-        y_pos = self.header_height + 20 + (len(self.input_connectors) - 1) * 20
-        connector.setPos(0, y_pos)
-        
-        # Add a label for the connector
-        label = QGraphicsTextItem(description or connector_id, self)
-        label.setPos(12, y_pos - 10)
-        label.setDefaultTextColor(Qt.GlobalColor.white)
-        
-        # Update block height if needed
-        min_height = y_pos + 30
-        if min_height > self.height:
-            self.height = min_height
-            self.update()
-            
+        # Lay out the connector and its label on the left side of the block
+        static = _static_label(description or connector_id)
+        self._layout_connector(connector, static, len(self.input_connectors) - 1)
         return connector
         
     def add_output_connector(self, connector_id, connector_type, description=""):
@@ -260,23 +447,136 @@ class BaseBlock(QGraphicsObject):
         connector = BlockConnector(self, connector_id, connector_type, False)
         self.output_connectors[connector_id] = connector
         
-        # Position the connector on the right side of the block
-        y_pos = self.header_height + 20 + (len(self.output_connectors) - 1) * 20
-        connector.setPos(self.width, y_pos)
+        # Lay out the connector and its label on the right side of the block
+        static = _static_label(description or connector_id)
+        self._layout_connector(connector, static, len(self.output_connectors) - 1)
+        return connector
         
-        # Add a label for the connector
-        label = QGraphicsTextItem(description or connector_id, self)
-        label.setPos(self.width - 12 - label.boundingRect().width(), y_pos - 10)
-        label.setDefaultTextColor(Qt.GlobalColor.white)
+    def _layout_connector(self, connector, static, index):
+        """
+        Lay out a new connector now, or queue it for finalize_layout() in a batch.
         
-        # Update block height if needed
-        min_height = y_pos + 30
+        Args:
+            connector: Connector to position
+            static: Static text of the connector label
+            index: Position of the connector on its side of the block
+        """
+        if self._in_batch:
+            self._pending_layout.append((connector, static, index))
+            return
+            
+        y_pos = self._place_connector(connector, static, index)
+        self._grow_to(y_pos + 30)
+        self._update_connector_index()
+        
+    def _place_connector(self, connector, static, index):
+        """
+        Position a connector, its label and its idle mark.
+        
+        Args:
+            connector: Connector to position
+            static: Static text of the connector label
+            index: Position of the connector on its side of the block
+            
+        Returns:
+            float: Vertical position of the connector
+        """
+        y_pos = self.header_height + 20 + index * 20
+        if connector.is_input:
+            connector.setPos(0, y_pos)
+            self._input_labels.append((QPointF(16, y_pos - 6), static))
+        else:
+            # Right-align the label against the connector
+            connector.setPos(self.width, y_pos)
+            x_pos = self.width - 16 - static.size().width()
+            self._output_labels.append((QPointF(x_pos, y_pos - 6), static))
+        self._add_connector_mark(connector)
+        return y_pos
+        
+    def finalize_layout(self):
+        """Position all connectors queued during a batch and size the block once."""
+        pending = self._pending_layout
+        if not pending:
+            return
+        self._pending_layout = []
+        
+        bottom = 0
+        for connector, static, index in pending:
+            bottom = max(bottom, self._place_connector(connector, static, index))
+            
+        # Apply the final height with a single geometry change
+        self._grow_to(bottom + 30)
+        
+    def _add_connector_mark(self, connector):
+        """
+        Record the idle appearance of a connector for drawing in paint().
+        
+        Args:
+            connector: Connector that was just positioned
+        """
+        kind = "flow" if connector.connector_type == "flow" else "data"
+        brush, pen = BlockConnector._STYLES[(kind, "normal")]
+        rect = connector.boundingRect().translated(connector.pos())
+        self._connector_marks.append((rect, brush, pen))
+        self._chrome = None
+        
+    def _grow_to(self, min_height):
+        """
+        Grow the block to at least the given height.
+        
+        Args:
+            min_height: Minimum height the block needs
+        """
         if min_height > self.height:
+            self.prepareGeometryChange()
             self.height = min_height
+            self._paths_dirty = True
             self.update()
             
-        return connector
+    def set_title(self, title):
+        """
+        Set the display title of the block.
+        
+        Args:
+            title: New title text
+        """
+        if title == self.title:
+            return
+        self.title = title
+        self._title_static = _static_label(title, self.width - 28)
+        self.update()
+        
+    def begin_batch(self):
+        """Start a batch of modifications, deferring geometry and repaint updates."""
+        self._in_batch = True
+        
+    def end_batch(self):
+        """Finish a batch of modifications and apply the deferred updates once."""
+        self._in_batch = False
+        self.finalize_layout()
+        self._update_connector_index()
+        self.update()
+        
+    @contextmanager
+    def batch(self):
+        """
+        Context manager wrapping begin_batch() and end_batch().
         
+        Yields:
+            BaseBlock: This block
+        """
+        self.begin_batch()
+        try:
+            yield self
+        finally:
+            self.end_batch()
+            
+    def _update_connector_index(self):
+        """Re-index this block's connectors if the scene keeps a connector index."""
+        index = getattr(self.scene(), "connector_index", None)
+        if index is not None:
+            index.update_block(self)
+            
     def set_property(self, name, value):
         """
         Set a property value.
@@ -285,18 +585,37 @@ class BaseBlock(QGraphicsObject):
             name: Property name
             value: Property value
         """
-        if name in self.properties and self.properties[name] != value:
-            old_value = self.properties[name]
-            self.properties[name] = value
+        # Skip unchanged values; identity is checked first since it is free
+        current = self.properties.get(name, _MISSING)
+        if current is value:
+            return False
+        if current is not _MISSING:
+            try:
+                if current == value:
+                    return False
+            except (TypeError, ValueError):
+                # Values without a plain boolean equality count as changed
+                pass
+                
+        self.properties[name] = value
+        if self.receivers(self.propertyChanged) > 0:
             self.propertyChanged.emit(self, name, value)
+        if not self._in_batch:
             self.update()
-            return True
-        elif name not in self.properties:
-            self.properties[name] = value
-            self.propertyChanged.emit(self, name, value)
+        return True
+        
+    def load_properties(self, properties):
+        """
+        Set many property values at once, e.g. when loading a saved block.
+        
+        No propertyChanged signals are emitted and the block is repainted once.
+        
+        Args:
+            properties: Mapping of property names to values
+        """
+        self.properties.update(properties)
+        if not self._in_batch:
             self.update()
-            return True
-        return False
         
     def get_property(self, name, default=None):
         """
@@ -314,13 +633,14 @@ class BaseBlock(QGraphicsObject):
     def itemChange(self, change, value):
         """Handle item changes."""
         if change == QGraphicsItem.GraphicsItemChange.ItemPositionChange and self.scene():
-            # Snap to grid
-            grid_size = 10
-            x = round(value.x() / grid_size) * grid_size
-            y = round(value.y() / grid_size) * grid_size
+            # Snap to grid, rounding halves up rather than to even
+            grid_size = self.GRID_SIZE
+            x = math.floor(value.x() / grid_size + 0.5) * grid_size
+            y = math.floor(value.y() / grid_size + 0.5) * grid_size
             return QPointF(x, y)
         elif change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged:
-            # Emit signal when position changes
+            # Keep the connector index in sync, then emit signal
+            self._update_connector_index()
             self.blockMoved.emit(self)
         elif change == QGraphicsItem.GraphicsItemChange.ItemSelectedChange:
             # Emit signal when selection changes
@@ -331,11 +651,14 @@ class BaseBlock(QGraphicsObject):
     def mousePressEvent(self, event):
         """Handle mouse press events."""
         if event.button() == Qt.MouseButton.LeftButton:
-            # Bring block to front when clicked
-            self.setZValue(1)
-            for item in self.scene().items():
-                if item != self and isinstance(item, BaseBlock):
-                    item.setZValue(0)
+            # Bring block to front when clicked, lowering the previous top block
+            scene = self.scene()
+            previous = getattr(scene, "top_block", None)
+            if previous is not self:
+                if previous is not None:
+                    previous.setZValue(0)
+                self.setZValue(1)
+                scene.top_block = self
         super().mousePressEvent(event)
         
     def mouseReleaseEvent(self, event):
@@ -355,6 +678,8 @@ class BaseBlock(QGraphicsObject):
             "type": self.block_type,
             "x": pos.x(),
             "y": pos.y(),
+            # Copied because the project takes ownership of this dict; later
+            # edits must not reach it before the canvas is synced again
             "properties": self.properties.copy()
         }
         return block_dict
@@ -380,7 +705,6 @@ class BaseBlock(QGraphicsObject):
         block.setPos(data.get("x", 0), data.get("y", 0))
         
         # Set properties
-        for name, value in data.get("properties", {}).items():
-            block.set_property(name, value)
+        block.load_properties(data.get("properties", {}))
             
         return block
\ No newline at end of file
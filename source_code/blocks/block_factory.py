@@ -6,9 +6,46 @@ This module provides functionality to create block instances from block definiti
 
 import json
 import os
+import secrets
+from itertools import chain, count
 from PyQt6.QtGui import QColor
 
-from .base_block import BaseBlock
+from .base_block import BaseBlock, connector_type_code
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Block ids are a per-process random prefix plus a counter, so ids stay unique
+# against blocks loaded from projects saved in earlier sessions
+_ID_PREFIX = secrets.token_hex(4)
+_id_counter = count()
+
+
+def validate_connections(pairs):
+    """
+    Filter connector pairs down to the ones that can be connected.
+    
+    A pair is valid when it joins an input to an output of the same connector
+    type, matching the checks in BlockConnector.connect_to.
+    
+    Args:
+        pairs: Iterable of (source connector, target connector) tuples
+        
+    Returns:
+        list: The valid pairs, in their original order
+    """
+    return [
+        (source, target) for source, target in pairs
+        if source.is_input != target.is_input
+        and source.connector_type_code == target.connector_type_code
+    ]
 
 
 class BlockFactory:
@@ -40,43 +77,65 @@ class BlockFactory:
             bool: True if definitions were loaded successfully, False otherwise
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                
-            # Process block categories
-            for category in data.get('blockCategories', []):
-                category_id = category.get('id')
-                if not category_id:
-                    continue
-                    
-                self.categories[category_id] = {
-                    'name': category.get('name', category_id),
-                    'color': category.get('color', '#808080'),
-                    'description': category.get('description', '')
-                }
-                
-                # Process blocks in this category
-                for block_def in category.get('blocks', []):
-                    block_id = block_def.get('id')
-                    if not block_id:
-                        continue
-                        
-                    self.block_types[block_id] = {
-                        'category': category_id,
-                        'name': block_def.get('name', block_id),
-                        'type': block_def.get('type', 'generic'),
-                        'description': block_def.get('description', ''),
-                        'inputs': block_def.get('inputs', []),
-                        'outputs': block_def.get('outputs', []),
-                        'properties': block_def.get('properties', []),
-                        'codeTemplate': block_def.get('codeTemplate', '')
-                    }
+            with open(file_path, 'rb') as f:
+                if ijson is not None:
+                    # Stream categories so only one is materialized at a time
+                    for category in ijson.items(f, 'blockCategories.item', use_float=True):
+                        self._ingest_category(category)
+                else:
+                    # orjson (when installed) and json both accept raw bytes
+                    raw = f.read()
+                    data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+                    for category in data.get('blockCategories', ()):
+                        self._ingest_category(category)
             
             return True
         except Exception as e:
             print(f"Error loading block definitions: {e}")
             return False
     
+    def _ingest_category(self, category):
+        """
+        Add one block category and its blocks to the factory.
+        
+        Args:
+            category: Category definition dictionary
+        """
+        category_get = category.get
+        category_id = category_get('id')
+        if not category_id:
+            return
+            
+        color = category_get('color', '#808080')
+        self.categories[category_id] = {
+            'name': category_get('name', category_id),
+            'color': color,
+            'qcolor': QColor(color),  # Parsed once, shared by every block
+            'description': category_get('description', '')
+        }
+        
+        # Process blocks in this category
+        block_types = {
+            block_id: {
+                'category': category_id,
+                'name': block_def.get('name', block_id),
+                'type': block_def.get('type', 'generic'),
+                'description': block_def.get('description', ''),
+                'inputs': block_def.get('inputs', []),
+                'outputs': block_def.get('outputs', []),
+                'properties': block_def.get('properties', []),
+                'codeTemplate': block_def.get('codeTemplate', '')
+            }
+            for block_def in category_get('blocks', ())
+            if (block_id := block_def.get('id'))
+        }
+        self.block_types.update(block_types)
+        
+        # Assign connector type codes up front so every connector shares them
+        for block_info in block_types.values():
+            for port in chain(block_info['inputs'], block_info['outputs']):
+                connector_type_code(port.get('type', 'data'))
+    
     def get_categories(self):
         """
         Get all block categories.
@@ -112,20 +171,19 @@ class BlockFactory:
         Returns:
             BaseBlock: New block instance or None if type is not found
         """
-        if block_type not in self.block_types:
+        block_info = self.block_types.get(block_type)
+        if block_info is None:
             return None
             
-        block_info = self.block_types[block_type]
         category_id = block_info.get('category')
         category_info = self.categories.get(category_id, {})
         
         # Generate a unique ID if not provided
         if not block_id:
-            import uuid
-            block_id = f"{block_type}_{uuid.uuid4().hex[:8]}"
+            block_id = f"{block_type}_{_ID_PREFIX}{next(_id_counter):04x}"
         
         # Create the block
-        color = QColor(category_info.get('color', '#808080'))
+        color = category_info.get('qcolor') or QColor('#808080')
         block = BaseBlock(
             block_id=block_id,
             block_type=block_type,
@@ -133,41 +191,42 @@ class BlockFactory:
             color=color
         )
         
-        # Add input connectors
-        for input_def in block_info.get('inputs', []):
-            input_id = input_def.get('id')
-            if not input_id:
-                continue
+        with block.batch():
+            # Add input connectors
+            for input_def in block_info.get('inputs', []):
+                input_id = input_def.get('id')
+                if not input_id:
+                    continue
                 
-            block.add_input_connector(
-                input_id,
-                input_def.get('type', 'data'),
-                input_def.get('description', input_id)
-            )
+                block.add_input_connector(
+                    input_id,
+                    input_def.get('type', 'data'),
+                    input_def.get('description', input_id)
+                )
             
-            # Set default property value if specified
-            if 'default' in input_def:
-                block.set_property(input_id, input_def['default'])
-        
-        # Add output connectors
-        for output_def in block_info.get('outputs', []):
-            output_id = output_def.get('id')
-            if not output_id:
-                continue
+                # Set default property value if specified
+                if 'default' in input_def:
+                    block.set_property(input_id, input_def['default'])
+        
+            # Add output connectors
+            for output_def in block_info.get('outputs', []):
+                output_id = output_def.get('id')
+                if not output_id:
+                    continue
                 
-            block.add_output_connector(
-                output_id,
-                output_def.get('type', 'data'),
-                output_def.get('description', output_id)
-            )
-        
-        # Set properties
-        for prop_def in block_info.get('properties', []):
-            prop_id = prop_def.get('id')
-            if not prop_id or 'default' not in prop_def:
-                continue
+                block.add_output_connector(
+                    output_id,
+                    output_def.get('type', 'data'),
+                    output_def.get('description', output_id)
+                )
+        
+            # Set properties
+            for prop_def in block_info.get('properties', []):
+                prop_id = prop_def.get('id')
+                if not prop_id or 'default' not in prop_def:
+                    continue
                 
-            block.set_property(prop_id, prop_def['default'])
+                block.set_property(prop_id, prop_def['default'])
         
         return block
     
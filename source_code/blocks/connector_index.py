@@ -0,0 +1,165 @@
+"""
+Connector Index Module
+
+This module provides a spatial index over connector positions for fast hit-testing.
+"""
+
+from itertools import chain
+
+
+class ConnectorIndex:
+    """
+    Uniform grid index of block connectors keyed by their scene position.
+    """
+
+    def __init__(self, cell_size=64):
+        """
+        Initialize a new connector index.
+
+        Args:
+            cell_size: Size of a grid cell in scene units
+        """
+        self.cell_size = cell_size
+        self._cells = {}
+        self._entries = {}
+
+    def _cell_for(self, x, y):
+        """
+        Get the grid cell containing a point.
+
+        Args:
+            x: Scene x coordinate
+            y: Scene y coordinate
+
+        Returns:
+            tuple: Grid cell coordinates
+        """
+        return (int(x // self.cell_size), int(y // self.cell_size))
+
+    def insert(self, connector):
+        """
+        Add a connector to the index or update its position.
+
+        Args:
+            connector: Connector to index
+        """
+        pos = connector.scenePos()
+        x, y = pos.x(), pos.y()
+        cell = self._cell_for(x, y)
+
+        entry = self._entries.get(connector)
+        if entry is not None and entry[0] != cell:
+            self._discard(connector, entry[0])
+            entry = None
+
+        if entry is None:
+            self._cells.setdefault(cell, set()).add(connector)
+        self._entries[connector] = (cell, x, y)
+
+    def remove(self, connector):
+        """
+        Remove a connector from the index.
+
+        Args:
+            connector: Connector to remove
+        """
+        entry = self._entries.pop(connector, None)
+        if entry is not None:
+            self._discard(connector, entry[0])
+
+    def _discard(self, connector, cell):
+        """Remove a connector from a grid cell."""
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(connector)
+            if not members:
+                del self._cells[cell]
+
+    def update_block(self, block):
+        """
+        Re-index all connectors of a block in one pass.
+
+        Args:
+            block: Block whose connectors moved
+        """
+        for connector in chain(block.input_connectors.values(), block.output_connectors.values()):
+            self.insert(connector)
+
+    def remove_block(self, block):
+        """
+        Remove all connectors of a block from the index.
+
+        Args:
+            block: Block being removed
+        """
+        for connector in chain(block.input_connectors.values(), block.output_connectors.values()):
+            self.remove(connector)
+
+    def clear(self):
+        """Remove all connectors from the index."""
+        self._cells = {}
+        self._entries = {}
+
+    def query(self, x, y, radius):
+        """
+        Find connectors within a radius of a point.
+
+        Args:
+            x: Scene x coordinate
+            y: Scene y coordinate
+            radius: Search radius in scene units
+
+        Returns:
+            list: Connectors within the radius
+        """
+        min_cx, min_cy = self._cell_for(x - radius, y - radius)
+        max_cx, max_cy = self._cell_for(x + radius, y + radius)
+        radius_sq = radius * radius
+
+        found = []
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                for connector in self._cells.get((cx, cy), ()):
+                    _, cx_pos, cy_pos = self._entries[connector]
+                    dx = cx_pos - x
+                    dy = cy_pos - y
+                    if dx * dx + dy * dy <= radius_sq:
+                        found.append(connector)
+        return found
+
+    def find_nearest(self, x, y, radius, accept=None):
+        """
+        Find the connector closest to a point within a radius.
+
+        Args:
+            x: Scene x coordinate
+            y: Scene y coordinate
+            radius: Search radius in scene units
+            accept: Optional predicate a connector must satisfy
+
+        Returns:
+            The nearest accepted connector or None if there is none
+        """
+        min_cx, min_cy = self._cell_for(x - radius, y - radius)
+        max_cx, max_cy = self._cell_for(x + radius, y + radius)
+
+        nearest = None
+        nearest_sq = radius * radius
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                for connector in self._cells.get((cx, cy), ()):
+                    _, cx_pos, cy_pos = self._entries[connector]
+                    dx = cx_pos - x
+                    dy = cy_pos - y
+                    dist_sq = dx * dx + dy * dy
+                    if dist_sq > nearest_sq or (nearest is not None and dist_sq == nearest_sq):
+                        continue
+                    if accept is not None and not accept(connector):
+                        continue
+
+                    # Nothing can be closer than an exact hit
+                    if dist_sq == 0:
+                        return connector
+                    nearest = connector
+                    nearest_sq = dist_sq
+        return nearest
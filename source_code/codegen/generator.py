@@ -4,13 +4,34 @@ Code Generator Module
 This module provides the main code generator class for translating visual blocks to C code.
 """
 
-import os
 import re
 import logging
 from typing import Dict, List, Set, Tuple, Optional, Any
 
+from utils.furi_helpers import FuriComponentHelper
+
 logger = logging.getLogger(__name__)
 
+# Components whose record is opened and closed by the generated code; the GUI
+# is set up by the main code template itself
+_RECORD_COMPONENTS = {
+    name: spec for name, spec in FuriComponentHelper.COMPONENTS.items()
+    if name != "gui"
+}
+
+# Template placeholders of the form ${name}
+_TEMPLATE_RE = re.compile(r'\$\{([^}]+)\}')
+
+# Escapes for embedding property text in a C string literal
+_C_STRING_ESCAPE = str.maketrans({'\\': '\\\\', '"': '\\"'})
+
+# Property value formatters keyed by exact type; anything else uses str().
+# Keying on type() keeps bool from being treated as its int base class.
+_COERCE = {
+    str: lambda value: f'"{value.translate(_C_STRING_ESCAPE)}"',
+    bool: lambda value: "true" if value else "false",
+}
+
 
 class CodeGenerator:
     """
@@ -32,6 +53,9 @@ class CodeGenerator:
         self.app_state_fields = []
         self.required_furi_components = set()
         
+        # Per block type: (block_info, template split around its placeholders)
+        self._template_cache = {}
+        
     def generate_code(self, project, canvas_data):
         """
         Generate C code from canvas data.
@@ -50,6 +74,7 @@ class CodeGenerator:
         self.global_variables = []
         self.app_state_fields = []
         self.required_furi_components = set()
+        self._template_cache = {}
         
         # Get manifest data
         manifest = project.get_manifest()
@@ -65,39 +90,21 @@ class CodeGenerator:
         # Add includes for required components
         for req in manifest.get("requires", []):
             if req == "gui":
+                # GUI setup is part of the main code template
                 self.required_furi_components.add("gui")
-            elif req == "storage":
-                self.includes.add("#include <storage/storage.h>")
-                self.required_furi_components.add("storage")
-            elif req == "subghz":
-                self.includes.add("#include <lib/subghz/subghz.h>")
-                self.required_furi_components.add("subghz")
-            elif req == "nfc":
-                self.includes.add("#include <lib/nfc/nfc.h>")
-                self.required_furi_components.add("nfc")
-            elif req == "infrared":
-                self.includes.add("#include <lib/infrared/infrared.h>")
-                self.required_furi_components.add("infrared")
-            elif req == "bt":
-                self.includes.add("#include <bt/bt_service.h>")
-                self.required_furi_components.add("bt")
+            elif req in _RECORD_COMPONENTS:
+                self.includes.update(_RECORD_COMPONENTS[req]["includes"])
+                self.required_furi_components.add(req)
         
         # Generate app state structure
         self.app_state_fields.append("    ViewPort* view_port;")
         self.app_state_fields.append("    Gui* gui;")
         
         # Add fields for required components
-        for component in self.required_furi_components:
-            if component == "storage":
-                self.app_state_fields.append("    Storage* storage;")
-            elif component == "subghz":
-                self.app_state_fields.append("    SubGhz* subghz;")
-            elif component == "nfc":
-                self.app_state_fields.append("    Nfc* nfc;")
-            elif component == "infrared":
-                self.app_state_fields.append("    Infrared* infrared;")
-            elif component == "bt":
-                self.app_state_fields.append("    BtService* bt;")
+        for component in sorted(self.required_furi_components):
+            spec = _RECORD_COMPONENTS.get(component)
+            if spec:
+                self.app_state_fields.extend(f"    {field}" for field in spec["state_fields"])
         
         # Add variables structure
         self.app_state_fields.append("    struct {")
@@ -111,17 +118,14 @@ class CodeGenerator:
         # Create a dictionary of blocks by ID
         blocks_by_id = {block["id"]: block for block in blocks}
         
-        # Create a dictionary of connections by block ID and port
+        # Create a dictionary of connections keyed by (source block ID, port)
         connections_by_source = {}
         for conn in connections:
-            from_block = conn["from"]["block"]
-            from_port = conn["from"]["port"]
-            to_block = conn["to"]["block"]
-            to_port = conn["to"]["port"]
-            
-            if from_block not in connections_by_source:
-                connections_by_source[from_block] = {}
-            connections_by_source[from_block][from_port] = (to_block, to_port)
+            from_data = conn["from"]
+            to_data = conn["to"]
+            connections_by_source[(from_data["block"], from_data["port"])] = (
+                to_data["block"], to_data["port"]
+            )
         
         # Find entry point blocks (app_on_start)
         entry_blocks = [
@@ -155,12 +159,12 @@ class CodeGenerator:
     
     def _process_block(self, block, blocks_by_id, connections_by_source, app_name, processed_blocks=None):
         """
-        Process a block and generate code for it.
+        Process a block and the flow chain following it, and generate code for them.
         
         Args:
             block: Block to process
             blocks_by_id: Dictionary of blocks by ID
-            connections_by_source: Dictionary of connections by source block ID and port
+            connections_by_source: Dictionary of connections keyed by (source block ID, port)
             app_name: Application name
             processed_blocks: Set of already processed block IDs
             
@@ -170,69 +174,86 @@ class CodeGenerator:
         if processed_blocks is None:
             processed_blocks = set()
             
-        block_id = block["id"]
-        if block_id in processed_blocks:
-            return ""  # Already processed this block
+        # Walk the "next" flow chain iteratively, stopping at blocks that were
+        # already processed (cycles) or that cannot generate code
+        chain = []
+        while block is not None:
+            block_id = block["id"]
+            if block_id in processed_blocks:
+                break  # Already processed this block
+                
+            processed_blocks.add(block_id)
             
-        processed_blocks.add(block_id)
-        
-        block_type = block["type"]
-        block_info = self.block_factory.get_block_info(block_type)
-        
-        if not block_info:
-            logger.warning(f"Unknown block type: {block_type}")
-            return ""
+            block_type = block["type"]
+            block_info, template_parts = self._get_template(block_type)
+            
+            if not block_info:
+                logger.warning(f"Unknown block type: {block_type}")
+                break
+                
+            # Check the code template for this block
+            if not template_parts:
+                logger.warning(f"No code template for block type: {block_type}")
+                break
+                
+            chain.append((block, template_parts))
+            
+            # Follow the flow connection; data connections don't generate code yet
+            next_target = connections_by_source.get((block_id, "next"))
+            block = blocks_by_id.get(next_target[0]) if next_target else None
             
-        # Get the code template for this block
-        code_template = block_info.get("codeTemplate", "")
-        if not code_template:
-            logger.warning(f"No code template for block type: {block_type}")
-            return ""
+        # Build the code from the end of the chain back, nesting each block's
+        # code into its predecessor's ${next_code}
+        code = ""
+        for block, template_parts in reversed(chain):
+            substitutions = self._block_substitutions(block, app_name)
+            substitutions["next_code"] = code
             
-        # Replace variables in the template
-        code = code_template
+            # Join the template's literal text with the placeholder values (odd
+            # entries are placeholder names); unknown placeholders are left as-is
+            code = "".join(
+                substitutions.get(part, f"${{{part}}}") if index % 2 else part
+                for index, part in enumerate(template_parts)
+            )
+            
+        return code
         
-        # Replace app name
-        code = code.replace("${app_name}", app_name)
+    def _block_substitutions(self, block, app_name):
+        """
+        Get the placeholder values for a block's code template.
         
-        # Replace property values
-        for prop_name, prop_value in block.get("properties", {}).items():
-            placeholder = f"${{{prop_name}}}"
-            if isinstance(prop_value, str):
-                # Escape quotes in strings
-                prop_value = f'"{prop_value}"'
-            elif isinstance(prop_value, bool):
-                prop_value = "true" if prop_value else "false"
-            else:
-                prop_value = str(prop_value)
-                
-            code = code.replace(placeholder, prop_value)
+        Args:
+            block: Block data
+            app_name: Application name
             
-        # Process connections
-        if block_id in connections_by_source:
-            for port, (target_block_id, target_port) in connections_by_source[block_id].items():
-                if port == "next":
-                    # This is a flow connection, process the next block
-                    target_block = blocks_by_id.get(target_block_id)
-                    if target_block:
-                        next_code = self._process_block(
-                            target_block, 
-                            blocks_by_id, 
-                            connections_by_source, 
-                            app_name,
-                            processed_blocks
-                        )
-                        code = code.replace("${next_code}", next_code)
-                    else:
-                        code = code.replace("${next_code}", "")
-                else:
-                    # This is a data connection, not implemented yet
-                    pass
-        else:
-            # No connections from this block
-            code = code.replace("${next_code}", "")
+        Returns:
+            dict: Placeholder values keyed by placeholder name
+        """
+        # Coerce properties to C literals
+        substitutions = {}
+        for prop_name, prop_value in block.get("properties", {}).items():
+            substitutions[prop_name] = _COERCE.get(type(prop_value), str)(prop_value)
+        substitutions["app_name"] = app_name
+        return substitutions
+        
+    def _get_template(self, block_type):
+        """
+        Get the block info and split code template for a block type.
+        
+        Args:
+            block_type: Type of block
             
-        return code
+        Returns:
+            tuple: (block_info, template_parts) where template_parts alternates
+                literal text and placeholder names, or is None without a template
+        """
+        cached = self._template_cache.get(block_type)
+        if cached is None:
+            block_info = self.block_factory.get_block_info(block_type)
+            code_template = block_info.get("codeTemplate", "") if block_info else ""
+            template_parts = _TEMPLATE_RE.split(code_template) if code_template else None
+            cached = self._template_cache[block_type] = (block_info, template_parts)
+        return cached
     
     def _generate_callbacks(self, app_name):
         """
@@ -278,18 +299,24 @@ static void {app_name}_input_callback(InputEvent* event, void* ctx) {{
         Returns:
             str: Generated main code
         """
+        # Join the collected lines once; generated C sources always use LF
+        includes_block = "\n".join(sorted(self.includes))
+        state_fields = "\n".join(self.app_state_fields)
+        declarations_block = "\n".join(self.function_declarations)
+        definitions_block = "\n".join(self.function_definitions)
+        
         # Generate app state structure
         app_state = f"""
 /**
  * Application state structure
  */
 typedef struct {{
-{os.linesep.join(self.app_state_fields)}
+{state_fields}
 }} {app_name}_state_t;
 """
         
         # Generate application cleanup function
-        cleanup_function = f"""
+        cleanup_parts = [f"""
 static void {app_name}_free(void* p) {{
     {app_name}_state_t* app = ({app_name}_state_t*)p;
     
@@ -300,39 +327,33 @@ static void {app_name}_free(void* p) {{
     
     // Close records
     furi_record_close(RECORD_GUI);
-"""
+"""]
         
         # Add cleanup for required components
-        for component in self.required_furi_components:
-            if component == "storage":
-                cleanup_function += f"    furi_record_close(RECORD_STORAGE);\n"
-            elif component == "subghz":
-                cleanup_function += f"    furi_record_close(RECORD_SUBGHZ);\n"
-            elif component == "nfc":
-                cleanup_function += f"    furi_record_close(RECORD_NFC);\n"
-            elif component == "infrared":
-                cleanup_function += f"    furi_record_close(RECORD_INFRARED);\n"
-            elif component == "bt":
-                cleanup_function += f"    furi_record_close(RECORD_BT);\n"
+        for component in sorted(self.required_furi_components):
+            spec = _RECORD_COMPONENTS.get(component)
+            if spec:
+                cleanup_parts.extend(f"    {line}\n" for line in spec["cleanup_code"])
                 
-        cleanup_function += f"""
+        cleanup_parts.append("""
     // Free app state
     free(app);
-}}
-"""
+}
+""")
+        cleanup_function = "".join(cleanup_parts)
         
         # Combine all parts
-        main_code = f"""/**
+        parts = [f"""/**
  * {app_name} application
  */
 
-{os.linesep.join(sorted(self.includes))}
+{includes_block}
 
 {app_state}
 
-{os.linesep.join(self.function_declarations)}
+{declarations_block}
 
-{os.linesep.join(self.function_definitions)}
+{definitions_block}
 
 {cleanup_function}
 
@@ -353,22 +374,15 @@ int32_t {entry_point}(void* p) {{
     // Open GUI and register view port
     app->gui = furi_record_open(RECORD_GUI);
     gui_add_view_port(app->gui, app->view_port, GuiLayerFullscreen);
-"""
+"""]
         
         # Add initialization for required components
-        for component in self.required_furi_components:
-            if component == "storage":
-                main_code += f"    app->storage = furi_record_open(RECORD_STORAGE);\n"
-            elif component == "subghz":
-                main_code += f"    app->subghz = furi_record_open(RECORD_SUBGHZ);\n"
-            elif component == "nfc":
-                main_code += f"    app->nfc = furi_record_open(RECORD_NFC);\n"
-            elif component == "infrared":
-                main_code += f"    app->infrared = furi_record_open(RECORD_INFRARED);\n"
-            elif component == "bt":
-                main_code += f"    app->bt = furi_record_open(RECORD_BT);\n"
+        for component in sorted(self.required_furi_components):
+            spec = _RECORD_COMPONENTS.get(component)
+            if spec:
+                parts.extend(f"    {line}\n" for line in spec["init_code"])
                 
-        main_code += f"""
+        parts.append(f"""
     // Main application loop
     view_port_enabled_set(app->view_port, true);
     
@@ -382,6 +396,6 @@ int32_t {entry_point}(void* p) {{
     
     return 0;
 }}
-"""
+""")
         
-        return main_code
\ No newline at end of file
+        return "".join(parts)
\ No newline at end of file
@@ -5,23 +5,73 @@ This module provides validators for generated C code.
 """
 
 import re
+import hashlib
 import logging
 import subprocess
-import tempfile
-import os
+from collections import OrderedDict
 from typing import Tuple, List, Dict
 
 logger = logging.getLogger(__name__)
 
+# Includes every generated app must have
+_REQUIRED_INCLUDES = (
+    "#include <furi.h>",
+    "#include <gui/gui.h>"
+)
+
+# Fixed markers the validators look for
+_VIEW_PORT_ALLOC = "view_port_alloc"
+_GUI_RECORD_OPEN = "furi_record_open(RECORD_GUI)"
+
+# Everything the validators look for, matched together in a single scan: a
+# fixed marker (group 1), an int32_t function definition (group 2) or the
+# type name of a typedef'd struct (group 3)
+_RE_SCAN = re.compile(
+    "(" + "|".join(
+        re.escape(marker) for marker in _REQUIRED_INCLUDES + (_VIEW_PORT_ALLOC, _GUI_RECORD_OPEN)
+    ) + ")"
+    r'|int32_t\s+(\w+)\s*\([^)]*\)\s*{'
+    r'|typedef\s+struct\s+{[^}]*}\s+(\w+)\s*;'
+)
+
+
+class CodeScan:
+    """
+    Features of a C source found in one pass, shared by the validators.
+    """
+    
+    def __init__(self, code: str):
+        """
+        Scan C code for the features the validators check.
+        
+        Args:
+            code: C code to scan
+        """
+        self.markers = set()
+        self.function_defs = set()
+        self.struct_typedefs = set()
+        
+        for match in _RE_SCAN.finditer(code):
+            marker, function_name, struct_name = match.groups()
+            if marker is not None:
+                self.markers.add(marker)
+            elif function_name is not None:
+                self.function_defs.add(function_name)
+            else:
+                self.struct_typedefs.add(struct_name)
+
 
 class CodeValidator:
     """
     Validates generated C code.
     """
     
+    # Number of gcc syntax results kept, keyed by a digest of the code
+    SYNTAX_CACHE_SIZE = 64
+    
     def __init__(self):
         """Initialize the code validator."""
-        pass
+        self._syntax_cache = OrderedDict()
         
     def validate_syntax(self, code: str) -> Tuple[bool, str]:
         """
@@ -33,96 +83,104 @@ class CodeValidator:
         Returns:
             tuple: (is_valid, error_message)
         """
-        # Create a temporary file with the code
-        with tempfile.NamedTemporaryFile(suffix='.c', delete=False) as temp_file:
-            temp_file_path = temp_file.name
-            temp_file.write(code.encode('utf-8'))
+        # Reuse the result for code that was already checked
+        digest = hashlib.blake2b(code.encode('utf-8'), digest_size=16).digest()
+        cached = self._syntax_cache.get(digest)
+        if cached is not None:
+            self._syntax_cache.move_to_end(digest)
+            return cached
             
         try:
-            # Run gcc to check syntax only (-fsyntax-only)
+            # Pipe the code to gcc on stdin and check syntax only (-fsyntax-only)
             result = subprocess.run(
-                ['gcc', '-fsyntax-only', '-Wall', temp_file_path],
+                ['gcc', '-xc', '-', '-fsyntax-only', '-Wall'],
+                input=code,
                 capture_output=True,
                 text=True
             )
             
             if result.returncode != 0:
                 # Syntax error
-                return False, result.stderr
-            
-            return True, ""
-            
-        except Exception as e:
+                syntax_result = (False, result.stderr)
+            else:
+                syntax_result = (True, "")
+                
+        except (OSError, subprocess.SubprocessError) as e:
+            # Not cached, so the check is retried once gcc is available
             return False, f"Validation error: {str(e)}"
             
-        finally:
-            # Clean up the temporary file
-            try:
-                os.unlink(temp_file_path)
-            except:
-                pass
+        # Remember the result, evicting the least recently used one
+        self._syntax_cache[digest] = syntax_result
+        if len(self._syntax_cache) > self.SYNTAX_CACHE_SIZE:
+            self._syntax_cache.popitem(last=False)
+        return syntax_result
                 
-    def validate_includes(self, code: str) -> Tuple[bool, str]:
+    def validate_includes(self, code: str, scan: CodeScan = None) -> Tuple[bool, str]:
         """
         Validate that all required includes are present.
         
         Args:
             code: C code to validate
+            scan: CodeScan of the code, built from code if omitted
             
         Returns:
             tuple: (is_valid, error_message)
         """
-        required_includes = [
-            "#include <furi.h>",
-            "#include <gui/gui.h>"
-        ]
-        
-        for include in required_includes:
-            if include not in code:
+        if scan is None:
+            scan = CodeScan(code)
+            
+        for include in _REQUIRED_INCLUDES:
+            if include not in scan.markers:
                 return False, f"Missing required include: {include}"
                 
         return True, ""
         
-    def validate_entry_point(self, code: str, entry_point: str) -> Tuple[bool, str]:
+    def validate_entry_point(self, code: str, entry_point: str, scan: CodeScan = None) -> Tuple[bool, str]:
         """
         Validate that the entry point function is defined.
         
         Args:
             code: C code to validate
             entry_point: Expected entry point function name
+            scan: CodeScan of the code, built from code if omitted
             
         Returns:
             tuple: (is_valid, error_message)
         """
+        if scan is None:
+            scan = CodeScan(code)
+            
         # Look for the entry point function definition
-        pattern = r'int32_t\s+' + re.escape(entry_point) + r'\s*\([^)]*\)\s*{'
-        if not re.search(pattern, code):
+        if entry_point not in scan.function_defs:
             return False, f"Missing entry point function: {entry_point}"
             
         return True, ""
         
-    def validate_app_structure(self, code: str, app_name: str) -> Tuple[bool, str]:
+    def validate_app_structure(self, code: str, app_name: str, scan: CodeScan = None) -> Tuple[bool, str]:
         """
         Validate that the application structure is properly defined.
         
         Args:
             code: C code to validate
             app_name: Application name
+            scan: CodeScan of the code, built from code if omitted
             
         Returns:
             tuple: (is_valid, error_message)
         """
+        if scan is None:
+            scan = CodeScan(code)
+            
         # Check for app state structure
-        state_pattern = r'typedef\s+struct\s+{[^}]*}\s+' + re.escape(app_name) + r'_state_t\s*;'
-        if not re.search(state_pattern, code):
+        if f"{app_name}_state_t" not in scan.struct_typedefs:
             return False, f"Missing app state structure: {app_name}_state_t"
             
         # Check for view port initialization
-        if "view_port_alloc" not in code:
+        if _VIEW_PORT_ALLOC not in scan.markers:
             return False, "Missing view port allocation"
             
         # Check for GUI initialization
-        if "furi_record_open(RECORD_GUI)" not in code:
+        if _GUI_RECORD_OPEN not in scan.markers:
             return False, "Missing GUI initialization"
             
         return True, ""
@@ -141,18 +199,21 @@ class CodeValidator:
         """
         errors = []
         
+        # Scan the code once for all validators
+        scan = CodeScan(code)
+        
         # Validate includes
-        valid, error = self.validate_includes(code)
+        valid, error = self.validate_includes(code, scan)
         if not valid:
             errors.append(error)
             
         # Validate entry point
-        valid, error = self.validate_entry_point(code, entry_point)
+        valid, error = self.validate_entry_point(code, entry_point, scan)
         if not valid:
             errors.append(error)
             
         # Validate app structure
-        valid, error = self.validate_app_structure(code, app_name)
+        valid, error = self.validate_app_structure(code, app_name, scan)
         if not valid:
             errors.append(error)
             
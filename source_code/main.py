@@ -8,10 +8,8 @@ A visual scripting environment for Flipper Zero app development.
 import sys
 import os
 import argparse
-from PyQt6.QtWidgets import QApplication
-from PyQt6.QtGui import QIcon
-
-from ui import MainWindow
+import logging
+from pathlib import Path
 
 
 def parse_arguments():
@@ -44,18 +42,27 @@ def parse_arguments():
 
 def main():
     """Main application entry point."""
-    # Parse command line arguments
+    # Parse command line arguments before loading Qt, so --help stays fast
     args = parse_arguments()
     
+    # Enable logging before the Qt imports so import-time errors are reported
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+        
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtGui import QIcon
+    
+    from ui import MainWindow
+    
     # Create application
     app = QApplication(sys.argv)
     app.setApplicationName("FlipperScriptStudio")
     app.setOrganizationName("FlipperScriptStudio")
     
     # Set application icon
-    icon_path = os.path.join(os.path.dirname(__file__), "assets", "icons", "app_icon.png")
-    if os.path.exists(icon_path):
-        app.setWindowIcon(QIcon(icon_path))
+    icon_path = Path(__file__).with_name("assets") / "icons" / "app_icon.png"
+    if icon_path.exists():
+        app.setWindowIcon(QIcon(str(icon_path)))
     
     # Create main window
     main_window = MainWindow()
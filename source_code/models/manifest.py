@@ -6,8 +6,21 @@ This module provides the data model for Flipper Zero app manifests.
 
 import os
 import re
+from types import MappingProxyType
 from PyQt6.QtCore import QObject, pyqtSignal
 
+# Patterns used to parse and validate manifest.txt, compiled once. The manifest
+# pattern matches every field in one pass: a quoted string field (groups 1-2),
+# stack_size (group 3) or the requires list body (group 4).
+_RE_MANIFEST = re.compile(
+    r'(appid|name|entry_point|version|icon)="([^"]+)"'
+    r'|stack_size=(\d+)'
+    r'|requires=\[(.*?)\]',
+    re.DOTALL
+)
+_RE_QUOTED = re.compile(r'"([^"]+)"')
+_RE_APPID_VALIDATE = re.compile(r'^[a-z0-9_]+$')
+
 
 class Manifest(QObject):
     """
@@ -31,6 +44,9 @@ class Manifest(QObject):
             "icon": None
         }
         
+        # Read-only view handed out by get_data(), rebuilt when data is replaced
+        self._view = MappingProxyType(self.data)
+        
     def set_data(self, data):
         """
         Set the manifest data.
@@ -39,17 +55,21 @@ class Manifest(QObject):
             data: Dictionary of manifest data
         """
         if self.data != data:
-            self.data = data.copy()
+            self.data = dict(data)
+            self._view = MappingProxyType(self.data)
             self.manifestChanged.emit(self.data)
             
     def get_data(self):
         """
         Get the manifest data.
         
+        The returned mapping is a live read-only view; use dict() on it for a
+        snapshot that can be modified.
+        
         Returns:
-            dict: Dictionary of manifest data
+            Mapping: Read-only view of the manifest data
         """
-        return self.data.copy()
+        return self._view
         
     def set_value(self, key, value):
         """
@@ -92,7 +112,7 @@ class Manifest(QObject):
             
         # Check app ID format (lowercase, underscores, no spaces)
         app_id = self.data.get("appid", "")
-        if not re.match(r'^[a-z0-9_]+$', app_id):
+        if not _RE_APPID_VALIDATE.match(app_id):
             return False, "App ID must contain only lowercase letters, numbers, and underscores"
             
         # Check version format
@@ -157,50 +177,25 @@ class Manifest(QObject):
         Returns:
             bool: True if manifest was loaded successfully, False otherwise
         """
-        try:
-            # Extract app ID
-            app_id_match = re.search(r'appid="([^"]+)"', text)
-            if app_id_match:
-                self.data["appid"] = app_id_match.group(1)
-                
-            # Extract name
-            name_match = re.search(r'name="([^"]+)"', text)
-            if name_match:
-                self.data["name"] = name_match.group(1)
-                
-            # Extract entry point
-            entry_point_match = re.search(r'entry_point="([^"]+)"', text)
-            if entry_point_match:
-                self.data["entry_point"] = entry_point_match.group(1)
-                
-            # Extract stack size
-            stack_size_match = re.search(r'stack_size=(\d+)', text)
-            if stack_size_match:
-                self.data["stack_size"] = int(stack_size_match.group(1))
+        # Extract all fields in a single scan
+        found = {}
+        for match in _RE_MANIFEST.finditer(text):
+            key, value, stack_size, requires_text = match.groups()
+            if stack_size is not None:
+                # A malformed stack_size is skipped, not fatal to the load
+                try:
+                    key, value = "stack_size", int(stack_size)
+                except ValueError:
+                    continue
+            elif requires_text is not None:
+                key, value = "requires", _RE_QUOTED.findall(requires_text)
                 
-            # Extract version
-            version_match = re.search(r'version="([^"]+)"', text)
-            if version_match:
-                self.data["version"] = version_match.group(1)
-                
-            # Extract icon
-            icon_match = re.search(r'icon="([^"]+)"', text)
-            if icon_match:
-                self.data["icon"] = icon_match.group(1)
-                
-            # Extract requirements
-            requires_match = re.search(r'requires=\[(.*?)\]', text, re.DOTALL)
-            if requires_match:
-                requires_text = requires_match.group(1)
-                requires = []
-                for req_match in re.finditer(r'"([^"]+)"', requires_text):
-                    requires.append(req_match.group(1))
-                self.data["requires"] = requires
-                
-            # Emit signal
-            self.manifestChanged.emit(self.data)
+            # The first occurrence of a field wins
+            found.setdefault(key, value)
+            
+        self.data.update(found)
             
-            return True
-        except Exception as e:
-            print(f"Error loading manifest from text: {e}")
-            return False
\ No newline at end of file
+        # Emit signal
+        self.manifestChanged.emit(self.data)
+        
+        return True
@@ -5,14 +5,92 @@ This module provides the data model for projects in the FlipperScriptStudio appl
 """
 
 import os
+import sys
+import stat
+import copy
 import json
 import datetime
+import tempfile
+from contextlib import contextmanager
 from PyQt6.QtCore import QObject, pyqtSignal
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Leading bytes of an autosave snapshot, naming its encoding
+_AUTOSAVE_MSGPACK = b"FSSM"
+_AUTOSAVE_JSON = b"FSSJ"
+
+
+def _new_file_mode():
+    """
+    Get the permission bits a newly created file gets under the umask.
+    
+    Returns:
+        int: File mode
+    """
+    # Linux reports the umask without changing it; elsewhere it can only be
+    # read by setting it, so restore it straight away
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return 0o666 & ~int(line.split()[1], 8)
+    except OSError:
+        pass
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def _loads(raw):
+    """
+    Parse project JSON, with orjson when installed.
+    
+    Args:
+        raw: Raw bytes of the project file
+        
+    Returns:
+        The parsed project data
+    """
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _intern_keys(record):
+    """
+    Copy a dictionary with its string keys interned.
+    
+    Loaded projects repeat the same few keys in every block and resource;
+    interning makes them share the string objects used by the code.
+    
+    Args:
+        record: Dictionary to copy
+        
+    Returns:
+        dict: Copy of the dictionary with interned keys
+    """
+    return {
+        sys.intern(key) if type(key) is str else key: value
+        for key, value in record.items()
+    }
+
 
 class Project(QObject):
     """
     Data model for a FlipperScriptStudio project.
+    
+    projectChanged is emitted from inside the mutators; slots doing heavy work
+    such as repainting should connect with Qt.ConnectionType.QueuedConnection
+    so they run on the next event loop pass instead of inside the change.
     """
     
     projectChanged = pyqtSignal()  # Emitted when project data changes
@@ -48,8 +126,8 @@ class Project(QObject):
             "connections": []
         }
         
-        # Resources
-        self.resources = []
+        # Resources keyed by name
+        self.resources = {}
         
         # Project file path
         self.file_path = None
@@ -57,6 +135,45 @@ class Project(QObject):
         # Modified flag
         self.modified = False
         
+        # Bumped whenever the canvas data is replaced
+        self._canvas_version = 0
+        
+        # Nesting depth of batch() blocks, and whether a change happened in one
+        self._update_depth = 0
+        self._change_pending = False
+        
+    def _notify_changed(self):
+        """Emit projectChanged now, or once when the current batch ends."""
+        if self._update_depth:
+            self._change_pending = True
+        else:
+            self.projectChanged.emit()
+            
+    def begin_update(self):
+        """Start a batch of changes, deferring projectChanged until it ends."""
+        self._update_depth += 1
+        
+    def end_update(self):
+        """Finish a batch of changes and emit projectChanged once if needed."""
+        self._update_depth -= 1
+        if self._update_depth == 0 and self._change_pending:
+            self._change_pending = False
+            self.projectChanged.emit()
+            
+    @contextmanager
+    def batch(self):
+        """
+        Context manager wrapping begin_update() and end_update().
+        
+        Yields:
+            Project: This project
+        """
+        self.begin_update()
+        try:
+            yield self
+        finally:
+            self.end_update()
+        
     def set_metadata(self, key, value):
         """
         Set a metadata value.
@@ -65,11 +182,28 @@ class Project(QObject):
             key: Metadata key
             value: Metadata value
         """
-        if key in self.metadata and self.metadata[key] != value:
-            self.metadata[key] = value
+        self.set_metadata_bulk({key: value})
+        
+    def set_metadata_bulk(self, mapping):
+        """
+        Set several metadata values as one change.
+        
+        The modification time is stamped and projectChanged emitted once, and
+        only if at least one value actually changed.
+        
+        Args:
+            mapping: Dictionary of metadata keys and values
+        """
+        changed = False
+        for key, value in mapping.items():
+            if key in self.metadata and self.metadata[key] != value:
+                self.metadata[key] = value
+                changed = True
+                
+        if changed:
             self.metadata["modified"] = datetime.datetime.now().isoformat()
             self.modified = True
-            self.projectChanged.emit()
+            self._notify_changed()
             
     def get_metadata(self, key, default=None):
         """
@@ -95,42 +229,67 @@ class Project(QObject):
             self.manifest = manifest_data.copy()
             self.modified = True
             self.manifestChanged.emit(self.manifest)
-            self.projectChanged.emit()
+            self._notify_changed()
             
     def get_manifest(self):
         """
         Get the manifest data.
         
+        The project's own dictionary is returned, not a copy; don't modify it,
+        use set_manifest() instead.
+        
         Returns:
             dict: Dictionary of manifest data
         """
-        return self.manifest.copy()
+        return self.manifest
         
-    def set_canvas(self, canvas_data):
+    def set_canvas(self, canvas_data, *, owned=False):
         """
         Set the canvas data.
         
+        The data is not compared against the current canvas; edits mark the
+        project modified through set_modified() as they happen.
+        
         Args:
             canvas_data: Dictionary of canvas data
+            owned: True if the caller hands over canvas_data and won't touch
+                it again, so it is stored without a copy
         """
-        if self.canvas != canvas_data:
-            self.canvas = canvas_data.copy()
-            self.modified = True
-            self.projectChanged.emit()
+        if canvas_data is self.canvas:
+            return
+            
+        self.canvas = canvas_data if owned else canvas_data.copy()
+        self._canvas_version += 1
+        self._notify_changed()
             
     def get_canvas(self):
         """
         Get the canvas data.
         
+        The project's own dictionary is returned, not a copy; don't modify it,
+        use snapshot_canvas() for a copy that can be changed.
+        
         Returns:
             dict: Dictionary of canvas data
         """
-        return self.canvas.copy()
+        return self.canvas
+        
+    def snapshot_canvas(self):
+        """
+        Get an independent copy of the canvas data.
+        
+        Returns:
+            dict: Deep copy of the canvas data
+        """
+        return copy.deepcopy(self.canvas)
         
     def add_resource(self, name, resource_type, path):
         """
         Add a resource to the project.
         
+        Resources are keyed by name, so this replaces any existing resource
+        with the same name.
+        
         Args:
             name: Resource name
             resource_type: Resource type
@@ -145,9 +304,9 @@ class Project(QObject):
             "path": path
         }
         
-        self.resources.append(resource)
+        self.resources[name] = resource
         self.modified = True
-        self.projectChanged.emit()
+        self._notify_changed()
         
         return resource
         
@@ -161,24 +320,152 @@ class Project(QObject):
         Returns:
             bool: True if resource was removed, False otherwise
         """
-        for i, resource in enumerate(self.resources):
-            if resource["name"] == name:
-                del self.resources[i]
-                self.modified = True
-                self.projectChanged.emit()
-                return True
-                
-        return False
+        if self.resources.pop(name, None) is None:
+            return False
+            
+        self.modified = True
+        self._notify_changed()
+        return True
         
     def get_resources(self):
         """
         Get all resources.
         
+        The resource dictionaries are the project's own; don't modify them,
+        use add_resource() and remove_resource() instead.
+        
         Returns:
             list: List of resources
         """
-        return self.resources.copy()
+        return list(self.resources.values())
         
+    def _to_data(self):
+        """
+        Collect the project data in its file layout.
+        
+        Returns:
+            dict: Project data
+        """
+        return {
+            "version": "1.0",
+            "metadata": self.metadata,
+            "manifest": self.manifest,
+            "canvas": self.canvas,
+            "resources": list(self.resources.values())
+        }
+        
+    def _apply_data(self, data):
+        """
+        Replace the project contents with data in the file layout.
+        
+        Args:
+            data: Project data
+        """
+        # Load metadata
+        self.metadata = data.get("metadata", {})
+        
+        # Load manifest
+        self.manifest = data.get("manifest", {})
+        
+        # Load canvas, interning the keys repeated in every block
+        self.canvas = data.get("canvas", {"blocks": [], "connections": []})
+        if "blocks" in self.canvas:
+            self.canvas["blocks"] = [_intern_keys(block) for block in self.canvas["blocks"]]
+        
+        # Load resources; files store them as a list, and only one resource
+        # per name can be kept
+        self.resources = {}
+        for resource in data.get("resources", []):
+            name = resource.get("name")
+            if not name:
+                print(f"Skipping resource without a name: {resource}")
+                continue
+            if name in self.resources:
+                print(f"Duplicate resource '{name}'; keeping the last entry")
+            self.resources[name] = _intern_keys(resource)
+        
+    def autosave(self, file_path):
+        """
+        Write a crash-recovery snapshot of the project.
+        
+        Snapshots use msgpack when installed and compact JSON otherwise; they
+        are cheaper to write than the indented project file but are not meant
+        to be edited or shared. The file path and modified flag are left as-is.
+        
+        Args:
+            file_path: Path of the snapshot file
+            
+        Returns:
+            bool: True if the snapshot was written, False otherwise
+        """
+        try:
+            data = self._to_data()
+            if msgpack is not None:
+                payload = _AUTOSAVE_MSGPACK + msgpack.packb(data, use_bin_type=True)
+            elif orjson is not None:
+                payload = _AUTOSAVE_JSON + orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+            else:
+                payload = _AUTOSAVE_JSON + json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+                
+            # Replace the previous snapshot in one step, from a uniquely named
+            # temporary file that is removed if anything fails
+            fd, temp_path = tempfile.mkstemp(
+                prefix=".autosave-",
+                dir=os.path.dirname(file_path) or "."
+            )
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(payload)
+                os.replace(temp_path, file_path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+            
+            return True
+        except Exception as e:
+            print(f"Error writing autosave: {e}")
+            return False
+            
+    def load_autosave(self, file_path):
+        """
+        Restore the project from a crash-recovery snapshot.
+        
+        The restored project is marked modified, since its changes were never
+        saved to the project file.
+        
+        Args:
+            file_path: Path of the snapshot file written by autosave()
+            
+        Returns:
+            bool: True if the snapshot was loaded successfully, False otherwise
+        """
+        try:
+            with open(file_path, 'rb') as f:
+                raw = f.read()
+                
+            # Decode according to the snapshot's leading bytes
+            header, body = raw[:4], raw[4:]
+            if header == _AUTOSAVE_MSGPACK:
+                if msgpack is None:
+                    raise ValueError("snapshot needs msgpack, which is not installed")
+                data = msgpack.unpackb(body, raw=False)
+            elif header == _AUTOSAVE_JSON:
+                data = _loads(body)
+            else:
+                raise ValueError("not an autosave snapshot")
+                
+            self._apply_data(data)
+            self.modified = True
+            
+            # Emit signals
+            self.manifestChanged.emit(self.manifest)
+            self._notify_changed()
+            
+            return True
+        except Exception as e:
+            print(f"Error loading autosave: {e}")
+            return False
+            
     def load(self, file_path):
         """
         Load project from file.
@@ -190,20 +477,10 @@ class Project(QObject):
             bool: True if project was loaded successfully, False otherwise
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with open(file_path, 'rb') as f:
+                data = _loads(f.read())
                 
-            # Load metadata
-            self.metadata = data.get("metadata", {})
-            
-            # Load manifest
-            self.manifest = data.get("manifest", {})
-            
-            # Load canvas
-            self.canvas = data.get("canvas", {"blocks": [], "connections": []})
-            
-            # Load resources
-            self.resources = data.get("resources", [])
+            self._apply_data(data)
             
             # Set file path
             self.file_path = file_path
@@ -213,7 +490,7 @@ class Project(QObject):
             
             # Emit signals
             self.manifestChanged.emit(self.manifest)
-            self.projectChanged.emit()
+            self._notify_changed()
             
             return True
         except Exception as e:
@@ -241,29 +518,59 @@ class Project(QObject):
             self.metadata["modified"] = datetime.datetime.now().isoformat()
             
             # Create project data
-            data = {
-                "version": "1.0",
-                "metadata": self.metadata,
-                "manifest": self.manifest,
-                "canvas": self.canvas,
-                "resources": self.resources
-            }
-            
-            # Save to file
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
+            data = self._to_data()
+            
+            # Serialize the whole document up front, with orjson when installed
+            if orjson is not None:
+                payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+            else:
+                payload = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+                
+            # Write to a temporary file next to the project and move it into
+            # place, so a failed save never leaves a truncated project file
+            fd, temp_path = tempfile.mkstemp(
+                prefix=".proj-",
+                dir=os.path.dirname(self.file_path) or "."
+            )
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                # mkstemp creates the file as 0600; keep the mode of the
+                # project being replaced, or use the umask default for a new one
+                try:
+                    mode = stat.S_IMODE(os.stat(self.file_path).st_mode)
+                except FileNotFoundError:
+                    mode = _new_file_mode()
+                os.chmod(temp_path, mode)
+                os.replace(temp_path, self.file_path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
                 
             # Reset modified flag
             self.modified = False
             
             # Emit signal
-            self.projectChanged.emit()
+            self._notify_changed()
             
             return True
         except Exception as e:
             print(f"Error saving project: {e}")
             return False
             
+    def set_modified(self, modified=True):
+        """
+        Set whether the project has unsaved changes.
+        
+        Args:
+            modified: New modified state
+        """
+        if self.modified != modified:
+            self.modified = modified
+            self._notify_changed()
+            
     def is_modified(self):
         """
         Check if project has been modified.
@@ -0,0 +1,59 @@
+"""
+Tests for the block canvas.
+"""
+
+import os
+import unittest
+
+try:
+    from PyQt6.QtWidgets import QApplication
+except ImportError:
+    QApplication = None
+
+
+@unittest.skipIf(QApplication is None, "PyQt6 is not installed")
+class CreateConnectionTest(unittest.TestCase):
+    """
+    A connector pair is drawn with a single line however often it is reported.
+    """
+    
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        cls.app = QApplication.instance() or QApplication([])
+        
+    def setUp(self):
+        from blocks import BaseBlock
+        from ui.canvas import BlockCanvas
+        
+        # Connectors are added first so add_block hooks up their signals
+        source = BaseBlock("source", "test", "Source")
+        target = BaseBlock("target", "test", "Target")
+        self.output = source.add_output_connector("out", "flow")
+        self.input = target.add_input_connector("in", "flow")
+        
+        self.canvas = BlockCanvas()
+        self.canvas.add_block(source)
+        self.canvas.add_block(target)
+        
+    def _connection_lines(self):
+        from ui.canvas import ConnectionLine
+        return [item for item in self.canvas.scene.items() if isinstance(item, ConnectionLine)]
+        
+    def test_same_pair_twice_keeps_one_line(self):
+        first = self.canvas.create_connection(self.output, self.input)
+        second = self.canvas.create_connection(self.input, self.output)
+        
+        self.assertIs(first, second)
+        self.assertEqual(len(self._connection_lines()), 1)
+        
+    def test_connect_to_draws_one_line(self):
+        # Both connectors emit connectionChanged for the new connection
+        self.output.connect_to(self.input)
+        
+        self.assertEqual(len(self._connection_lines()), 1)
+        self.assertEqual(len(self.canvas.connections), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
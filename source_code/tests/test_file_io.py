@@ -0,0 +1,40 @@
+"""
+Tests for the file I/O utilities.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from utils import file_io
+
+
+class WriteJsonFileTest(unittest.TestCase):
+    """
+    write_json_file writes the same document with and without orjson.
+    """
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_dir.name, "data.json")
+        
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        
+    def _write_and_read(self):
+        data = {1: "one", "two": 2}
+        self.assertTrue(file_io.write_json_file(self.file_path, data))
+        return file_io.read_json_file(self.file_path)
+        
+    @unittest.skipIf(file_io.orjson is None, "orjson is not installed")
+    def test_int_key_with_orjson(self):
+        self.assertEqual(self._write_and_read(), {"1": "one", "two": 2})
+        
+    def test_int_key_without_orjson(self):
+        with mock.patch.object(file_io, "orjson", None):
+            self.assertEqual(self._write_and_read(), {"1": "one", "two": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
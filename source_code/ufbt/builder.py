@@ -17,6 +17,9 @@ from .config import UfbtConfig
 
 logger = logging.getLogger(__name__)
 
+# Line uFBT prints with the path of a built FAP package
+_FAP_RE = re.compile(r'Saved to: (.+\.fap)')
+
 
 class UfbtBuilder:
     """
@@ -45,17 +48,21 @@ class UfbtBuilder:
             tuple: (success, message)
         """
         try:
-            # Create app directory
             app_dir = os.path.join(output_dir, app_name)
-            os.makedirs(app_dir, exist_ok=True)
+            file_paths = {
+                file_name: os.path.join(app_dir, file_name)
+                for file_name in files
+            }
+            
+            # Create the app directory and each distinct parent directory once
+            parents = {app_dir}
+            parents.update(os.path.dirname(file_path) for file_path in file_paths.values())
+            for parent in parents:
+                os.makedirs(parent, exist_ok=True)
             
             # Write files
             for file_name, content in files.items():
-                file_path = os.path.join(app_dir, file_name)
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
+                Path(file_paths[file_name]).write_text(content, encoding='utf-8')
                     
             return True, f"Application structure created at {app_dir}"
             
@@ -78,38 +85,37 @@ class UfbtBuilder:
             app_dir = os.path.join(output_dir, app_name)
             os.makedirs(app_dir, exist_ok=True)
             
-            # Generate manifest content
-            lines = []
-            lines.append(f"App(")
-            lines.append(f"    appid=\"{manifest_data.get('appid', app_name)}\"")
-            lines.append(f"    name=\"{manifest_data.get('name', app_name)}\"")
-            lines.append(f"    apptype=FlipperAppType.EXTERNAL")
-            lines.append(f"    entry_point=\"{manifest_data.get('entry_point', 'app_main')}\"")
-            lines.append(f"    stack_size={manifest_data.get('stack_size', 1024)}")
-            lines.append(f"    version=\"{manifest_data.get('version', '1.0')}\"")
-            
             # Add icon if present
             icon = manifest_data.get("icon")
+            icon_block = ""
             if icon and os.path.exists(icon):
                 icon_filename = os.path.basename(icon)
                 # Copy icon to app directory
-                shutil.copy(icon, os.path.join(app_dir, icon_filename))
-                lines.append(f"    icon=\"{icon_filename}\"")
+                shutil.copyfile(icon, os.path.join(app_dir, icon_filename))
+                icon_block = f'\n    icon="{icon_filename}"'
                 
             # Add requirements
             reqs = manifest_data.get("requires", [])
+            reqs_block = ""
             if reqs:
-                lines.append("    requires=[")
-                for req in reqs:
-                    lines.append(f"        \"{req}\",")
-                lines.append("    ]")
+                reqs_block = "\n    requires=[\n" + "".join(f'        "{req}",\n' for req in reqs) + "    ]"
                 
-            lines.append(")")
+            # Generate manifest content in one formatting pass
+            content = (
+                f'App(\n'
+                f'    appid="{manifest_data.get("appid", app_name)}"\n'
+                f'    name="{manifest_data.get("name", app_name)}"\n'
+                f'    apptype=FlipperAppType.EXTERNAL\n'
+                f'    entry_point="{manifest_data.get("entry_point", "app_main")}"\n'
+                f'    stack_size={manifest_data.get("stack_size", 1024)}\n'
+                f'    version="{manifest_data.get("version", "1.0")}"'
+                f'{icon_block}{reqs_block}\n'
+                f')'
+            )
             
             # Write manifest file
             manifest_path = os.path.join(app_dir, "application.fam")
-            with open(manifest_path, 'w', encoding='utf-8') as f:
-                f.write("\n".join(lines))
+            Path(manifest_path).write_text(content, encoding='utf-8')
                 
             return True, f"Manifest created at {manifest_path}"
             
@@ -129,31 +135,24 @@ class UfbtBuilder:
         """
         try:
             # Prepare command
-            cmd = [self.config.ufbt_path]
+            cmd = self.config.command()
             
             if clean:
                 cmd.append("clean")
                 
-            # Change to app directory
-            cwd = os.getcwd()
-            os.chdir(app_dir)
-            
-            try:
-                # Run uFBT
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    check=False
-                )
-                
-                if result.returncode == 0:
-                    return True, result.stdout, ""
-                else:
-                    return False, result.stdout, result.stderr
-            finally:
-                # Restore working directory
-                os.chdir(cwd)
+            # Run uFBT
+            result = subprocess.run(
+                cmd,
+                capture_output=True,
+                text=True,
+                check=False,
+                cwd=app_dir
+            )
+            
+            if result.returncode == 0:
+                return True, result.stdout, ""
+            else:
+                return False, result.stdout, result.stderr
                 
         except Exception as e:
             return False, "", f"Build error: {str(e)}"
@@ -170,28 +169,21 @@ class UfbtBuilder:
         """
         try:
             # Prepare command
-            cmd = [self.config.ufbt_path, "flash"]
-            
-            # Change to app directory
-            cwd = os.getcwd()
-            os.chdir(app_dir)
-            
-            try:
-                # Run uFBT flash
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    check=False
-                )
-                
-                if result.returncode == 0:
-                    return True, result.stdout, ""
-                else:
-                    return False, result.stdout, result.stderr
-            finally:
-                # Restore working directory
-                os.chdir(cwd)
+            cmd = self.config.command("flash")
+            
+            # Run uFBT flash
+            result = subprocess.run(
+                cmd,
+                capture_output=True,
+                text=True,
+                check=False,
+                cwd=app_dir
+            )
+            
+            if result.returncode == 0:
+                return True, result.stdout, ""
+            else:
+                return False, result.stdout, result.stderr
                 
         except Exception as e:
             return False, "", f"Flash error: {str(e)}"
@@ -209,43 +201,37 @@ class UfbtBuilder:
         """
         try:
             # Prepare command
-            cmd = [self.config.ufbt_path, "fap"]
-            
-            # Change to app directory
-            cwd = os.getcwd()
-            os.chdir(app_dir)
-            
-            try:
-                # Run uFBT fap
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    check=False
-                )
-                
-                if result.returncode == 0:
-                    # Find the FAP file in the output
-                    fap_path_match = re.search(r'Saved to: (.+\.fap)', result.stdout)
-                    if fap_path_match:
-                        fap_path = fap_path_match.group(1)
+            cmd = self.config.command("fap")
+            
+            # Run uFBT fap
+            result = subprocess.run(
+                cmd,
+                capture_output=True,
+                text=True,
+                check=False,
+                cwd=app_dir
+            )
+            
+            if result.returncode == 0:
+                # Find the FAP file in the output
+                fap_path_match = _FAP_RE.search(result.stdout)
+                if fap_path_match:
+                    # uFBT may print the path relative to the app directory
+                    fap_path = os.path.join(app_dir, fap_path_match.group(1))
+                    
+                    # Copy to output directory if specified
+                    if output_dir:
+                        os.makedirs(output_dir, exist_ok=True)
+                        fap_filename = os.path.basename(fap_path)
+                        output_path = os.path.join(output_dir, fap_filename)
+                        shutil.copyfile(fap_path, output_path)
+                        return True, output_path, ""
                         
-                        # Copy to output directory if specified
-                        if output_dir:
-                            os.makedirs(output_dir, exist_ok=True)
-                            fap_filename = os.path.basename(fap_path)
-                            output_path = os.path.join(output_dir, fap_filename)
-                            shutil.copy(fap_path, output_path)
-                            return True, output_path, ""
-                            
-                        return True, fap_path, ""
-                    else:
-                        return False, "", "FAP file path not found in output"
+                    return True, fap_path, ""
                 else:
-                    return False, "", result.stderr
-            finally:
-                # Restore working directory
-                os.chdir(cwd)
+                    return False, "", "FAP file path not found in output"
+            else:
+                return False, "", result.stderr
                 
         except Exception as e:
             return False, "", f"FAP creation error: {str(e)}"
\ No newline at end of file
@@ -5,15 +5,132 @@ This module provides configuration management for uFBT integration.
 """
 
 import os
+import sys
 import json
 import logging
 import platform
 import subprocess
 from pathlib import Path
+from functools import lru_cache
 from typing import Dict, Optional, List, Tuple
 
 logger = logging.getLogger(__name__)
 
+# uFBT repository checkouts looked for when uFBT isn't installed
+_UFBT_REPO_SCRIPTS = (
+    "./temp/ufbt_repo/ufbt/__main__.py",
+    "../temp/ufbt_repo/ufbt/__main__.py",
+    "./ufbt_repo/ufbt/__main__.py"
+)
+
+# Standard FURI components that are always available
+_FURI_COMPONENTS = ("gui", "storage", "subghz", "nfc", "infrared", "bt")
+
+
+@lru_cache(maxsize=1)
+def _find_ufbt_path() -> str:
+    """
+    Find the uFBT executable in the system path.
+    
+    Cached for the session, since the lookup spawns a process.
+    
+    Returns:
+        str: Path to uFBT executable or None if not found
+    """
+    try:
+        # Try to find ufbt in PATH
+        if platform.system() == "Windows":
+            result = subprocess.run(
+                ["where", "ufbt"], 
+                capture_output=True, 
+                text=True, 
+                check=False
+            )
+            if result.returncode == 0:
+                return result.stdout.strip().split("\n")[0]
+        else:
+            result = subprocess.run(
+                ["which", "ufbt"], 
+                capture_output=True, 
+                text=True, 
+                check=False
+            )
+            if result.returncode == 0:
+                return result.stdout.strip()
+                
+        # Check if ufbt is installed as a Python module
+        try:
+            import ufbt
+            return "ufbt"  # Use module name directly
+        except ImportError:
+            pass
+            
+        # Look for ufbt in common locations, stopping at the first hit
+        for path in _UFBT_REPO_SCRIPTS:
+            if os.path.isfile(path):
+                return f"python {path}"
+                
+        logger.warning("uFBT not found in PATH or common locations")
+        return "ufbt"  # Default to just the name, hoping it's in PATH
+        
+    except Exception as e:
+        logger.error(f"Error finding uFBT: {e}")
+        return "ufbt"  # Default to just the name
+
+
+def _ufbt_argv(ufbt_path: str, *args: str) -> List[str]:
+    """
+    Build the argument list for running a uFBT command without a shell.
+    
+    Args:
+        ufbt_path: Path to the uFBT executable, or "python <script>" for a
+            repository checkout
+        *args: uFBT arguments
+        
+    Returns:
+        list: Command argument list
+    """
+    # Repository checkouts are run with the current interpreter
+    if ufbt_path.startswith("python "):
+        return [sys.executable, ufbt_path[len("python "):], *args]
+    return [ufbt_path, *args]
+
+
+@lru_cache(maxsize=8)
+def _get_sdk_state(ufbt_path: str) -> Dict:
+    """
+    Get the current SDK state from uFBT.
+    
+    Cached per uFBT path; UfbtConfig.refresh_sdk_state() clears the cache.
+    
+    Args:
+        ufbt_path: Path to the uFBT executable or repository
+        
+    Returns:
+        dict: SDK state information
+    """
+    try:
+        # Run ufbt status --json
+        result = subprocess.run(
+            _ufbt_argv(ufbt_path, "status", "--json"),
+            capture_output=True, 
+            text=True, 
+            check=False
+        )
+        
+        if result.returncode == 0:
+            try:
+                return json.loads(result.stdout)
+            except json.JSONDecodeError:
+                logger.error("Failed to parse uFBT status output as JSON")
+        else:
+            logger.error(f"uFBT status command failed: {result.stderr}")
+            
+    except Exception as e:
+        logger.error(f"Error getting SDK state: {e}")
+        
+    return {}
+
 
 class UfbtConfig:
     """
@@ -29,93 +146,32 @@ class UfbtConfig:
         Args:
             ufbt_path: Path to the uFBT executable or repository
         """
-        self.ufbt_path = ufbt_path or self._find_ufbt_path()
+        self.ufbt_path = ufbt_path or _find_ufbt_path()
         self.ufbt_home = os.environ.get("UFBT_HOME", self.DEFAULT_UFBT_HOME)
-        self.sdk_state = self._get_sdk_state()
+        self.sdk_state = _get_sdk_state(self.ufbt_path)
         
-    def _find_ufbt_path(self) -> str:
+    def command(self, *args: str) -> List[str]:
         """
-        Find the uFBT executable in the system path.
+        Build the argument list for running a uFBT command without a shell.
         
+        Args:
+            *args: uFBT arguments
+            
         Returns:
-            str: Path to uFBT executable or None if not found
+            list: Command argument list
         """
-        try:
-            # Try to find ufbt in PATH
-            if platform.system() == "Windows":
-                result = subprocess.run(
-                    ["where", "ufbt"], 
-                    capture_output=True, 
-                    text=True, 
-                    check=False
-                )
-                if result.returncode == 0:
-                    return result.stdout.strip().split("\n")[0]
-            else:
-                result = subprocess.run(
-                    ["which", "ufbt"], 
-                    capture_output=True, 
-                    text=True, 
-                    check=False
-                )
-                if result.returncode == 0:
-                    return result.stdout.strip()
-                    
-            # Check if ufbt is installed as a Python module
-            try:
-                import ufbt
-                return "ufbt"  # Use module name directly
-            except ImportError:
-                pass
-                
-            # Look for ufbt in common locations
-            common_paths = [
-                "./temp/ufbt_repo/ufbt/__main__.py",
-                "../temp/ufbt_repo/ufbt/__main__.py",
-                "./ufbt_repo/ufbt/__main__.py"
-            ]
-            
-            for path in common_paths:
-                if os.path.exists(path):
-                    return f"python {path}"
-                    
-            logger.warning("uFBT not found in PATH or common locations")
-            return "ufbt"  # Default to just the name, hoping it's in PATH
-            
-        except Exception as e:
-            logger.error(f"Error finding uFBT: {e}")
-            return "ufbt"  # Default to just the name
-            
-    def _get_sdk_state(self) -> Dict:
+        return _ufbt_argv(self.ufbt_path, *args)
+        
+    def refresh_sdk_state(self) -> Dict:
         """
-        Get the current SDK state from uFBT.
+        Query uFBT for the SDK state again, bypassing the cached result.
         
         Returns:
             dict: SDK state information
         """
-        try:
-            # Run ufbt status --json
-            cmd = f"{self.ufbt_path} status --json"
-            result = subprocess.run(
-                cmd, 
-                shell=True,
-                capture_output=True, 
-                text=True, 
-                check=False
-            )
-            
-            if result.returncode == 0:
-                try:
-                    return json.loads(result.stdout)
-                except json.JSONDecodeError:
-                    logger.error("Failed to parse uFBT status output as JSON")
-            else:
-                logger.error(f"uFBT status command failed: {result.stderr}")
-                
-        except Exception as e:
-            logger.error(f"Error getting SDK state: {e}")
-            
-        return {}
+        _get_sdk_state.cache_clear()
+        self.sdk_state = _get_sdk_state(self.ufbt_path)
+        return self.sdk_state
         
     def is_sdk_installed(self) -> bool:
         """
@@ -165,7 +221,7 @@ class UfbtConfig:
             tuple: (success, message)
         """
         try:
-            cmd = [self.ufbt_path, "update"]
+            cmd = self.command("update")
             
             if target:
                 cmd.extend(["--hw-target", target])
@@ -182,7 +238,7 @@ class UfbtConfig:
             
             if result.returncode == 0:
                 # Refresh SDK state
-                self.sdk_state = self._get_sdk_state()
+                self.refresh_sdk_state()
                 return True, "SDK updated successfully"
             else:
                 return False, f"SDK update failed: {result.stderr}"
@@ -190,14 +246,11 @@ class UfbtConfig:
         except Exception as e:
             return False, f"SDK update error: {str(e)}"
             
-    def get_furi_components(self) -> List[str]:
+    def get_furi_components(self) -> Tuple[str, ...]:
         """
-        Get a list of available FURI components.
+        Get the available FURI components.
         
         Returns:
-            list: List of FURI component names
+            tuple: FURI component names
         """
-        # Standard components that are always available
-        components = ["gui", "storage", "subghz", "nfc", "infrared", "bt"]
-        
-        return components
\ No newline at end of file
+        return _FURI_COMPONENTS
\ No newline at end of file
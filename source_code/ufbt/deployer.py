@@ -6,9 +6,15 @@ This module provides functionality to deploy Flipper Zero applications to device
 
 import os
 import re
+import ctypes
+import shutil
+import time
+import getpass
+import platform
 import logging
 import subprocess
 import serial
+from concurrent.futures import ThreadPoolExecutor
 import serial.tools.list_ports
 from typing import Dict, List, Tuple, Optional
 
@@ -16,12 +22,64 @@ from .config import UfbtConfig
 
 logger = logging.getLogger(__name__)
 
+# Operating system name, looked up once
+_SYSTEM = platform.system()
+
+# Login name of the current user, looked up on first use
+_USER = None
+
+
+def _current_user() -> str:
+    """
+    Get the login name of the current user, looked up on first use.
+    
+    Returns:
+        str: User name
+    """
+    global _USER
+    if _USER is None:
+        _USER = getpass.getuser()
+    return _USER
+
+
+def _find_apps_volume(parent: str) -> Optional[str]:
+    """
+    Find the first mounted volume under a directory that has an apps folder.
+    
+    Args:
+        parent: Directory holding mount points
+        
+    Returns:
+        str: Path to the volume or None if not found
+    """
+    # One directory read gives every entry and its type
+    with os.scandir(parent) as entries:
+        for entry in entries:
+            if entry.is_dir() and os.path.isdir(os.path.join(entry.path, "apps")):
+                return entry.path
+    return None
+
+
+# GetDriveTypeW result for removable drives, which is how the Flipper's SD card
+# is mounted
+_DRIVE_REMOVABLE = 2
+
+
+# USB (vendor ID, product ID) pairs of Flipper Zero serial ports
+_FLIPPER_USB_IDS = frozenset({(0x0483, 0x5740)})
+
 
 class UfbtDeployer:
     """
     Deployer for Flipper Zero applications.
     """
     
+    # Seconds a serial port scan is reused by list_devices()
+    PORTS_CACHE_TTL = 1.5
+    
+    # Seconds a storage lookup is reused by detect_flipper_storage()
+    STORAGE_CACHE_TTL = 5.0
+    
     def __init__(self, config: UfbtConfig = None):
         """
         Initialize the uFBT deployer.
@@ -31,34 +89,77 @@ class UfbtDeployer:
         """
         self.config = config or UfbtConfig()
         
-    def list_devices(self) -> List[Dict[str, str]]:
+        # Last serial port scan and when it was taken (time.monotonic())
+        self._ports_cache = None
+        self._ports_cache_ts = 0.0
+        
+        # Last storage lookup result and when it was taken
+        self._storage_cache = None
+        self._storage_cache_ts = None
+        
+    def list_devices(self, refresh: bool = False) -> List[Dict[str, str]]:
         """
         List connected Flipper Zero devices.
         
+        Port enumeration is slow (a WMI query on Windows), so a scan is reused
+        for PORTS_CACHE_TTL seconds unless refresh is set.
+        
+        Args:
+            refresh: Whether to rescan even if a recent scan is available
+            
         Returns:
             list: List of dictionaries with device information
         """
+        # Reuse a recent scan
+        now = time.monotonic()
+        if (not refresh and self._ports_cache is not None
+                and now - self._ports_cache_ts < self.PORTS_CACHE_TTL):
+            return list(self._ports_cache)
+            
         devices = []
         
         try:
             # List serial ports
             ports = serial.tools.list_ports.comports()
             
-            for port in ports:
-                # Check if this is likely a Flipper Zero
-                if (port.vid == 0x0483 and port.pid == 0x5740) or "Flipper" in port.description:
-                    devices.append({
-                        "port": port.device,
-                        "description": port.description,
-                        "hardware_id": port.hwid,
-                        "serial_number": port.serial_number
-                    })
-                    
+            # Match by USB IDs first; only fall back to the description text
+            # when no port has a Flipper Zero's IDs
+            matches = [port for port in ports if (port.vid, port.pid) in _FLIPPER_USB_IDS]
+            if not matches:
+                matches = [port for port in ports if "Flipper" in (port.description or "")]
+                
+            for port in matches:
+                devices.append({
+                    "port": port.device,
+                    "description": port.description,
+                    "hardware_id": port.hwid,
+                    "serial_number": port.serial_number
+                })
+                
+            self._ports_cache = devices
+            self._ports_cache_ts = now
+            
         except Exception as e:
             logger.error(f"Error listing devices: {e}")
             
-        return devices
+        return list(devices)
         
+    def refresh(self) -> Tuple[List[Dict[str, str]], Optional[str]]:
+        """
+        Rescan for connected devices and mounted storage at the same time.
+        
+        The serial port scan and the storage search both spend most of their
+        time waiting on the OS, so running them side by side takes about as
+        long as the slower of the two.
+        
+        Returns:
+            tuple: (devices, storage_path)
+        """
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            devices = executor.submit(self.list_devices, True)
+            storage_path = executor.submit(self.detect_flipper_storage, True)
+            return devices.result(), storage_path.result()
+            
     def deploy_app(self, app_dir: str, device_port: str = None) -> Tuple[bool, str]:
         """
         Deploy an application to a Flipper Zero device.
@@ -72,31 +173,24 @@ class UfbtDeployer:
         """
         try:
             # Prepare command
-            cmd = [self.config.ufbt_path, "launch"]
+            cmd = self.config.command("launch")
             
             if device_port:
                 cmd.extend(["--port", device_port])
                 
-            # Change to app directory
-            cwd = os.getcwd()
-            os.chdir(app_dir)
-            
-            try:
-                # Run uFBT launch
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    check=False
-                )
-                
-                if result.returncode == 0:
-                    return True, "Application deployed successfully"
-                else:
-                    return False, f"Deployment failed: {result.stderr}"
-            finally:
-                # Restore working directory
-                os.chdir(cwd)
+            # Run uFBT launch in the app directory
+            result = subprocess.run(
+                cmd,
+                capture_output=True,
+                text=True,
+                check=False,
+                cwd=app_dir
+            )
+            
+            if result.returncode == 0:
+                return True, "Application deployed successfully"
+            else:
+                return False, f"Deployment failed: {result.stderr}"
                 
         except Exception as e:
             return False, f"Deployment error: {str(e)}"
@@ -114,7 +208,7 @@ class UfbtDeployer:
         """
         try:
             # Prepare command
-            cmd = [self.config.ufbt_path, "install"]
+            cmd = self.config.command("install")
             
             if device_port:
                 cmd.extend(["--port", device_port])
@@ -137,53 +231,59 @@ class UfbtDeployer:
         except Exception as e:
             return False, f"Installation error: {str(e)}"
             
-    def detect_flipper_storage(self) -> Optional[str]:
+    def detect_flipper_storage(self, refresh: bool = False) -> Optional[str]:
         """
         Detect Flipper Zero storage mounted as a drive.
         
+        The result, found or not, is reused for STORAGE_CACHE_TTL seconds
+        unless refresh is set.
+        
+        Args:
+            refresh: Whether to search again even if a recent result is available
+            
         Returns:
             str: Path to the Flipper Zero storage or None if not found
         """
-        try:
-            import platform
-            system = platform.system()
+        # Reuse a recent lookup
+        now = time.monotonic()
+        if (not refresh and self._storage_cache_ts is not None
+                and now - self._storage_cache_ts < self.STORAGE_CACHE_TTL):
+            return self._storage_cache
             
-            if system == "Windows":
-                # On Windows, check all drives
-                import win32api
+        self._storage_cache = self._find_flipper_storage()
+        self._storage_cache_ts = now
+        return self._storage_cache
+        
+    def _find_flipper_storage(self) -> Optional[str]:
+        """
+        Search the mounted drives for Flipper Zero storage.
+        
+        Returns:
+            str: Path to the Flipper Zero storage or None if not found
+        """
+        try:
+            if _SYSTEM == "Windows":
+                # On Windows, check the removable drives
+                kernel32 = ctypes.windll.kernel32
+                buffer = ctypes.create_unicode_buffer(256)
+                length = kernel32.GetLogicalDriveStringsW(len(buffer), buffer)
                 
-                drives = win32api.GetLogicalDriveStrings().split('\000')[:-1]
-                for drive in drives:
-                    if os.path.exists(os.path.join(drive, "apps")):
+                for drive in buffer[:length].split('\000'):
+                    if not drive or kernel32.GetDriveTypeW(drive) != _DRIVE_REMOVABLE:
+                        continue
+                    if os.path.isdir(os.path.join(drive, "apps")):
                         return drive
                         
-            elif system == "Darwin":  # macOS
+            elif _SYSTEM == "Darwin":  # macOS
                 # Check /Volumes for Flipper
-                volumes_dir = "/Volumes"
-                for volume in os.listdir(volumes_dir):
-                    volume_path = os.path.join(volumes_dir, volume)
-                    if os.path.exists(os.path.join(volume_path, "apps")):
-                        return volume_path
-                        
-            elif system == "Linux":
-                # Check /media/<user> and /mnt
-                import getpass
-                user = getpass.getuser()
+                return _find_apps_volume("/Volumes")
                 
-                # Check /media/<user>
-                media_dir = f"/media/{user}"
-                if os.path.exists(media_dir):
-                    for volume in os.listdir(media_dir):
-                        volume_path = os.path.join(media_dir, volume)
-                        if os.path.exists(os.path.join(volume_path, "apps")):
-                            return volume_path
-                            
-                # Check /mnt
-                mnt_dir = "/mnt"
-                if os.path.exists(mnt_dir):
-                    for volume in os.listdir(mnt_dir):
-                        volume_path = os.path.join(mnt_dir, volume)
-                        if os.path.exists(os.path.join(volume_path, "apps")):
+            elif _SYSTEM == "Linux":
+                # Check /media/<user>, then /mnt
+                for mount_dir in (f"/media/{_current_user()}", "/mnt"):
+                    if os.path.isdir(mount_dir):
+                        volume_path = _find_apps_volume(mount_dir)
+                        if volume_path:
                             return volume_path
                             
         except Exception as e:
@@ -215,12 +315,12 @@ class UfbtDeployer:
             if not os.path.exists(apps_dir):
                 return False, f"Apps directory not found at {apps_dir}"
                 
-            # Copy the FAP file
-            import shutil
+            # Copy the FAP file; copyfile skips the permission copy (FAT
+            # ignores it) and uses the kernel's zero-copy path where available
             fap_filename = os.path.basename(fap_path)
             dest_path = os.path.join(apps_dir, fap_filename)
             
-            shutil.copy(fap_path, dest_path)
+            shutil.copyfile(fap_path, dest_path)
             
             return True, f"Application copied to {dest_path}"
             
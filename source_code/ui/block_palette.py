@@ -4,14 +4,45 @@ Block Palette Module
 This module provides the palette of available blocks for the drag-and-drop interface.
 """
 
-from PyQt6.QtCore import Qt, QSize, QMimeData, pyqtSignal
+from PyQt6.QtCore import Qt, QSize, QMimeData, QTimer, pyqtSignal
 from PyQt6.QtGui import QColor, QPen, QBrush, QPainter, QDrag, QFont
 from PyQt6.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QScrollArea,
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QScrollArea,
     QFrame, QLineEdit, QTreeWidget, QTreeWidgetItem, QSizePolicy
 )
 
 
+# Bold font shared by all palette items, created on first use
+_ITEM_FONT = None
+
+
+def _item_font():
+    """
+    Get the bold font used for palette item labels, created on first use.
+    
+    Returns:
+        QFont: Shared item font
+    """
+    global _ITEM_FONT
+    if _ITEM_FONT is None:
+        _ITEM_FONT = QFont()
+        _ITEM_FONT.setBold(True)
+    return _ITEM_FONT
+
+
+def _trigrams(text):
+    """
+    Get the set of three-character substrings of a string.
+    
+    Args:
+        text: Text to split
+        
+    Returns:
+        set: Trigrams of the text
+    """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
 class BlockPaletteItem(QFrame):
     """
     Represents a block in the palette that can be dragged onto the canvas.
@@ -34,6 +65,11 @@ class BlockPaletteItem(QFrame):
         self.description = description
         self.color = color or QColor(100, 100, 100)
         
+        # Paint resources derived from the color, built once
+        self._brush = QBrush(self.color)
+        self._hover_brush = QBrush(self.color.lighter(120))
+        self._border_pen = QPen(self.color.darker(150), 1)
+        
         # Set up appearance
         self.setFrameShape(QFrame.Shape.Box)
         self.setFrameShadow(QFrame.Shadow.Raised)
@@ -42,32 +78,31 @@ class BlockPaletteItem(QFrame):
         self.setMaximumHeight(30)
         self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         
-        # Enable mouse tracking for hover effects
-        self.setMouseTracking(True)
+        # paintEvent fills the whole item, so Qt needn't clear it first;
+        # hover needs only enter/leave events, which arrive without mouse tracking
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
         
         # Track hover state
         self.hover = False
         
+        # Drag image, grabbed on the first drag and reused until a resize
+        self._drag_pixmap = None
+        
     def paintEvent(self, event):
         """Paint the block palette item."""
+        # Only axis-aligned rectangles and text are drawn, so no antialiasing
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
         
         # Draw background
-        if self.hover:
-            painter.fillRect(self.rect(), QBrush(self.color.lighter(120)))
-        else:
-            painter.fillRect(self.rect(), QBrush(self.color))
+        painter.fillRect(self.rect(), self._hover_brush if self.hover else self._brush)
             
         # Draw border
-        painter.setPen(QPen(self.color.darker(150), 1))
+        painter.setPen(self._border_pen)
         painter.drawRect(self.rect().adjusted(0, 0, -1, -1))
         
         # Draw text
         painter.setPen(Qt.GlobalColor.white)
-        font = QFont()
-        font.setBold(True)
-        painter.setFont(font)
+        painter.setFont(_item_font())
         painter.drawText(self.rect().adjusted(10, 0, -10, 0), 
                         Qt.AlignmentFlag.AlignVCenter, self.name)
         
@@ -105,13 +140,20 @@ class BlockPaletteItem(QFrame):
         drag.setMimeData(mime_data)
         
         # Create a pixmap of the item for the drag cursor
-        pixmap = self.grab()
-        drag.setPixmap(pixmap)
+        if self._drag_pixmap is None:
+            self._drag_pixmap = self.grab()
+        drag.setPixmap(self._drag_pixmap)
         drag.setHotSpot(event.position().toPoint())
         
         # Execute drag
         drag.exec(Qt.DropAction.CopyAction)
         
+    def resizeEvent(self, event):
+        """Handle resize events."""
+        # The drag image must match the new size
+        self._drag_pixmap = None
+        super().resizeEvent(event)
+        
     def sizeHint(self):
         """Return the preferred size of the item."""
         return QSize(200, 30)
@@ -124,6 +166,9 @@ class BlockPalette(QWidget):
     
     blockDragged = pyqtSignal(str)  # Emitted when a block is dragged from the palette
     
+    # Milliseconds after the last keystroke before the search is applied
+    SEARCH_DELAY_MS = 150
+    
     def __init__(self, parent=None):
         """
         Initialize a new block palette.
@@ -143,11 +188,19 @@ class BlockPalette(QWidget):
         self.search_label = QLabel("Search:")
         self.search_box = QLineEdit()
         self.search_box.setPlaceholderText("Search blocks...")
-        self.search_box.textChanged.connect(self.filter_blocks)
+        self.search_box.textChanged.connect(self._schedule_filter)
         self.search_layout.addWidget(self.search_label)
         self.search_layout.addWidget(self.search_box)
         self.layout.addLayout(self.search_layout)
         
+        # Apply the search once typing pauses, not on every keystroke
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(self.SEARCH_DELAY_MS)
+        self._search_timer.timeout.connect(
+            lambda: self.filter_blocks(self.search_box.text())
+        )
+        
         # Create tree widget for categories
         self.tree = QTreeWidget()
         self.tree.setHeaderHidden(True)
@@ -162,6 +215,13 @@ class BlockPalette(QWidget):
         # Dictionary to store block items
         self.block_items = {}
         
+        # Block types keyed by each trigram of their lowercased searchable text
+        self._trigram_index = {}
+        
+        # Block types and category IDs currently hidden by the search
+        self._hidden_blocks = set()
+        self._hidden_categories = set()
+        
     def add_category(self, category_id, name, color=None, description=""):
         """
         Add a category to the palette.
@@ -226,15 +286,22 @@ class BlockPalette(QWidget):
         # Set item widget
         self.tree.setItemWidget(item, 0, block_widget)
         
-        # Store block item
+        # Store block item, with the lowercased fields the search matches
+        search_fields = (name.lower(), description.lower(), block_type.lower())
         self.block_items[block_type] = {
             'item': item,
             'widget': block_widget,
             'category': category_id,
             'name': name,
-            'description': description
+            'description': description,
+            'search_fields': search_fields
         }
         
+        # Index the block under every trigram of its searchable fields
+        for field in search_fields:
+            for trigram in _trigrams(field):
+                self._trigram_index.setdefault(trigram, set()).add(block_type)
+        
         return item
         
     def load_blocks_from_factory(self, block_factory):
@@ -251,6 +318,9 @@ class BlockPalette(QWidget):
         self.tree.clear()
         self.categories = {}
         self.block_items = {}
+        self._trigram_index = {}
+        self._hidden_blocks = set()
+        self._hidden_categories = set()
         
         # Load categories
         categories = block_factory.get_categories()
@@ -258,7 +328,7 @@ class BlockPalette(QWidget):
             self.add_category(
                 category_id=category_id,
                 name=category_info.get('name', category_id),
-                color=QColor(category_info.get('color', '#808080')),
+                color=category_info.get('qcolor') or QColor(category_info.get('color', '#808080')),
                 description=category_info.get('description', '')
             )
             
@@ -281,6 +351,15 @@ class BlockPalette(QWidget):
                 
         return block_count
         
+    def _schedule_filter(self, text):
+        """
+        Restart the search delay after the search text changed.
+        
+        Args:
+            text: New search text
+        """
+        self._search_timer.start()
+        
     def filter_blocks(self, text):
         """
         Filter blocks by search text.
@@ -288,35 +367,71 @@ class BlockPalette(QWidget):
         Args:
             text: Search text
         """
-        # Show all items if search is empty
+        # Hide and show items without repainting the tree after each one
+        self.tree.setUpdatesEnabled(False)
+        self.tree.blockSignals(True)
+        try:
+            self._apply_filter(text)
+        finally:
+            self.tree.blockSignals(False)
+            self.tree.setUpdatesEnabled(True)
+            
+        self.tree.viewport().update()
+        
+    def _apply_filter(self, text):
+        """
+        Hide the blocks and categories that don't match the search text.
+        
+        Args:
+            text: Search text
+        """
+        # Nothing is hidden when the search is empty
         if not text:
-            for category_id, category in self.categories.items():
-                category['item'].setHidden(False)
-                
-            for block_type, block in self.block_items.items():
-                block['item'].setHidden(False)
-                
+            self._set_hidden(set(), set())
             return
             
         # Convert to lowercase for case-insensitive search
         search_text = text.lower()
         
-        # Hide all categories initially
-        for category_id, category in self.categories.items():
-            category['item'].setHidden(True)
+        # Narrow the candidates to blocks containing every trigram of the
+        # search text; shorter searches check every block
+        if len(search_text) >= 3:
+            postings = [self._trigram_index.get(trigram, set()) for trigram in _trigrams(search_text)]
+            candidates = set.intersection(*postings)
+        else:
+            candidates = self.block_items.keys()
             
-        # Show matching blocks and their categories
-        for block_type, block in self.block_items.items():
-            if (search_text in block['name'].lower() or 
-                search_text in block['description'].lower() or
-                search_text in block_type.lower()):
-                # Show this block
-                block['item'].setHidden(False)
-                
-                # Show its category
-                category_id = block['category']
-                if category_id in self.categories:
-                    self.categories[category_id]['item'].setHidden(False)
-            else:
-                # Hide this block
-                block['item'].setHidden(True)
\ No newline at end of file
+        # Confirm the candidates with a substring check per field
+        matches = {
+            block_type for block_type in candidates
+            if any(search_text in field for field in self.block_items[block_type]['search_fields'])
+        }
+        
+        # Hide the other blocks, and the categories without a matching block
+        shown_categories = {self.block_items[block_type]['category'] for block_type in matches}
+        self._set_hidden(
+            self.block_items.keys() - matches,
+            self.categories.keys() - shown_categories
+        )
+        
+    def _set_hidden(self, hidden_blocks, hidden_categories):
+        """
+        Hide exactly the given blocks and categories, touching only the items
+        whose visibility changes.
+        
+        Args:
+            hidden_blocks: Set of block types to hide
+            hidden_categories: Set of category IDs to hide
+        """
+        for block_type in self._hidden_blocks - hidden_blocks:
+            self.block_items[block_type]['item'].setHidden(False)
+        for block_type in hidden_blocks - self._hidden_blocks:
+            self.block_items[block_type]['item'].setHidden(True)
+            
+        for category_id in self._hidden_categories - hidden_categories:
+            self.categories[category_id]['item'].setHidden(False)
+        for category_id in hidden_categories - self._hidden_categories:
+            self.categories[category_id]['item'].setHidden(True)
+            
+        self._hidden_blocks = hidden_blocks
+        self._hidden_categories = hidden_categories
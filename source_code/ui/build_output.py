@@ -7,6 +7,7 @@ This module provides a UI component for displaying build output and logs.
 import os
 import re
 import time
+import signal
 from PyQt6.QtCore import Qt, pyqtSignal, QTimer
 from PyQt6.QtGui import QTextCursor, QColor, QTextCharFormat, QFont
 from PyQt6.QtWidgets import (
@@ -14,6 +15,16 @@ from PyQt6.QtWidgets import (
     QLabel, QProgressBar, QSplitter
 )
 
+# Classifies a build output line in one match call. Each alternative looks
+# ahead through the whole line, so the first kind listed wins when a line has
+# several (an error line mentioning "completed" is still an error).
+_LINE_KIND_RE = re.compile(
+    r'(?=.*error:)(?P<error>)'
+    r'|(?=.*warning:)(?P<warning>)'
+    r'|(?=.*(?:success|completed))(?P<success>)',
+    re.IGNORECASE
+)
+
 
 class BuildOutputWidget(QWidget):
     """
@@ -22,6 +33,18 @@ class BuildOutputWidget(QWidget):
     
     buildFinished = pyqtSignal(bool, str)  # Emitted when build finishes (success, message)
     
+    # Lines kept in the output; older lines are dropped beyond this
+    MAX_OUTPUT_LINES = 10000
+    
+    # Time-based progress estimate interval, used until build output arrives
+    PROGRESS_INTERVAL_MS = 500
+    
+    # Rough number of output lines in a full build, for the progress estimate
+    EXPECTED_BUILD_LINES = 200
+    
+    # Milliseconds a cancelled build gets to exit before it is killed
+    CANCEL_GRACE_MS = 2000
+    
     def __init__(self, parent=None):
         """
         Initialize the build output widget.
@@ -54,6 +77,7 @@ class BuildOutputWidget(QWidget):
         self.output_text.setReadOnly(True)
         self.output_text.setLineWrapMode(QTextEdit.LineWrapMode.NoWrap)
         self.output_text.setFont(QFont("Courier New", 10))
+        self.output_text.document().setMaximumBlockCount(self.MAX_OUTPUT_LINES)
         self.layout.addWidget(self.output_text)
         
         # Create button layout
@@ -88,6 +112,7 @@ class BuildOutputWidget(QWidget):
         self.build_timer = QTimer()
         self.build_timer.timeout.connect(self.update_progress)
         self.build_start_time = 0
+        self.build_output_lines = 0
         
         # Text formats for different message types
         self.error_format = QTextCharFormat()
@@ -102,8 +127,25 @@ class BuildOutputWidget(QWidget):
         self.info_format = QTextCharFormat()
         self.info_format.setForeground(QColor(0, 0, 255))
         
+        # Formats for build output lines, keyed by _LINE_KIND_RE group name
+        self._line_formats = {
+            "error": self.error_format,
+            "warning": self.warning_format,
+            "success": self.success_format
+        }
+        
+        # Build output lines waiting to be inserted, as (text, format) pairs,
+        # and the timer that flushes them in one document update
+        self._pending_output = []
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(50)
+        self._flush_timer.timeout.connect(self._flush_output)
+        
     def clear_output(self):
         """Clear the output text."""
+        self._pending_output.clear()
+        self._flush_timer.stop()
         self.output_text.clear()
         
     def copy_output(self):
@@ -126,20 +168,64 @@ class BuildOutputWidget(QWidget):
         )
         
         if file_path:
+            # Include build output still waiting to be inserted
+            if self._pending_output:
+                self._flush_output()
+                
+            # Write one line at a time instead of copying the whole document
+            document = self.output_text.document()
             with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(self.output_text.toPlainText())
+                block = document.begin()
+                while block.isValid():
+                    f.write(block.text())
+                    f.write("\n")
+                    block = block.next()
                 
     def cancel_build(self):
         """Cancel the current build process."""
         if self.is_building and self.build_process:
             try:
-                self.build_process.terminate()
+                self._stop_process(self.build_process)
                 self.append_message("Build cancelled by user", self.info_format)
                 self.set_building(False)
                 self.buildFinished.emit(False, "Build cancelled by user")
             except Exception as e:
                 self.append_message(f"Error cancelling build: {str(e)}", self.error_format)
                 
+    def _stop_process(self, process):
+        """
+        Ask a build process and its children to exit, killing them if they
+        are still running after CANCEL_GRACE_MS.
+        
+        Args:
+            process: Build process object
+        """
+        pid = getattr(process, "pid", None)
+        if pid is None or os.name != "posix":
+            # No process group to signal; stop the process itself
+            process.terminate()
+            return
+            
+        # Signal the whole group (uFBT, scons and the compilers) when the build
+        # runs in its own session; never signal this application's own group
+        try:
+            group = os.getpgid(pid)
+        except ProcessLookupError:
+            return
+        if group == os.getpgrp():
+            process.terminate()
+            return
+            
+        os.killpg(group, signal.SIGTERM)
+        
+        def kill_remaining():
+            try:
+                os.killpg(group, signal.SIGKILL)
+            except ProcessLookupError:
+                pass  # Everything already exited
+                
+        QTimer.singleShot(self.CANCEL_GRACE_MS, kill_remaining)
+        
     def set_building(self, building: bool):
         """
         Set the building state.
@@ -152,8 +238,9 @@ class BuildOutputWidget(QWidget):
         
         if building:
             self.build_start_time = time.time()
+            self.build_output_lines = 0
             self.progress_bar.setValue(0)
-            self.build_timer.start(100)  # Update every 100ms
+            self.build_timer.start(self.PROGRESS_INTERVAL_MS)
             self.status_label.setText("Building...")
         else:
             self.build_timer.stop()
@@ -172,6 +259,21 @@ class BuildOutputWidget(QWidget):
         progress = min(int(elapsed / 30.0 * 100), 99)
         self.progress_bar.setValue(progress)
         
+    def _advance_progress(self, line_count):
+        """
+        Advance the progress bar from build output instead of elapsed time.
+        
+        Args:
+            line_count: Number of new output lines
+        """
+        # Output now drives progress, so the time-based estimate can stop
+        self.build_timer.stop()
+        self.build_output_lines += line_count
+        
+        progress = min(99, self.build_output_lines * 100 // self.EXPECTED_BUILD_LINES)
+        if progress > self.progress_bar.value():
+            self.progress_bar.setValue(progress)
+        
     def append_message(self, message: str, format: QTextCharFormat = None):
         """
         Append a message to the output text.
@@ -180,6 +282,10 @@ class BuildOutputWidget(QWidget):
             message: Message to append
             format: Text format to use
         """
+        # Keep queued build output ahead of this message
+        if self._pending_output:
+            self._flush_output()
+            
         cursor = self.output_text.textCursor()
         cursor.movePosition(QTextCursor.MoveOperation.End)
         
@@ -188,8 +294,7 @@ class BuildOutputWidget(QWidget):
         else:
             cursor.insertText(message + "\n")
             
-        self.output_text.setTextCursor(cursor)
-        self.output_text.ensureCursorVisible()
+        self._scroll_to_end()
         
     def append_build_output(self, output: str):
         """
@@ -205,19 +310,64 @@ class BuildOutputWidget(QWidget):
                 continue
                 
             # Apply different formats based on line content
-            if re.search(r'error:', line, re.IGNORECASE):
-                self.append_message(line, self.error_format)
-            elif re.search(r'warning:', line, re.IGNORECASE):
-                self.append_message(line, self.warning_format)
-            elif re.search(r'success|completed', line, re.IGNORECASE):
-                self.append_message(line, self.success_format)
-            else:
-                self.append_message(line)
+            match = _LINE_KIND_RE.match(line)
+            self._pending_output.append((line, self._line_formats[match.lastgroup] if match else None))
+            
+        if self.is_building:
+            self._advance_progress(len(lines))
+            
+        # Insert the queued lines together shortly, instead of one at a time
+        if self._pending_output and not self._flush_timer.isActive():
+            self._flush_timer.start()
+            
+    def _flush_output(self):
+        """Insert all queued build output lines in a single document update."""
+        self._flush_timer.stop()
+        pending = self._pending_output
+        if not pending:
+            return
+        self._pending_output = []
+        
+        self.output_text.setUpdatesEnabled(False)
+        try:
+            cursor = self.output_text.textCursor()
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+            cursor.beginEditBlock()
+            
+            # Insert each run of consecutive lines sharing a format at once
+            run_start = 0
+            for index in range(1, len(pending) + 1):
+                if index < len(pending) and pending[index][1] is pending[run_start][1]:
+                    continue
+                    
+                text = "".join(line + "\n" for line, _ in pending[run_start:index])
+                format = pending[run_start][1]
+                if format:
+                    cursor.insertText(text, format)
+                else:
+                    cursor.insertText(text)
+                run_start = index
+                
+            cursor.endEditBlock()
+        finally:
+            self.output_text.setUpdatesEnabled(True)
+            
+        self._scroll_to_end()
+        
+    def _scroll_to_end(self):
+        """Scroll the output to its last line."""
+        # The insert cursor is a local copy, so the view's cursor and any
+        # selection are left alone; only the scroll position moves
+        scroll_bar = self.output_text.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.maximum())
                 
     def set_build_process(self, process):
         """
         Set the current build process.
         
+        On POSIX, start the process with start_new_session=True so that
+        cancelling the build also stops the tools it launches.
+        
         Args:
             process: Build process object
         """
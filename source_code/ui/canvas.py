@@ -4,14 +4,22 @@ Canvas Module
 This module provides the canvas component for the drag-and-drop interface.
 """
 
-from PyQt6.QtCore import Qt, QPointF, pyqtSignal, QRectF
-from PyQt6.QtGui import QPen, QBrush, QColor, QPainter, QPainterPath
+from PyQt6.QtCore import Qt, pyqtSignal, QRectF, QTimer
+from PyQt6.QtGui import QPen, QBrush, QColor, QPainter, QPainterPath, QPixmap
 from PyQt6.QtWidgets import (
     QGraphicsView, QGraphicsScene, QGraphicsItem, 
     QGraphicsLineItem, QGraphicsPathItem
 )
 
-from blocks import BaseBlock, BlockConnector
+from blocks import BaseBlock, ConnectorIndex, validate_connections
+
+# Connection line pens, by the type of the starting connector
+_FLOW_PEN = QPen(QColor(50, 150, 250), 2.5, Qt.PenStyle.SolidLine,
+                 Qt.PenCapStyle.RoundCap, Qt.PenJoinStyle.RoundJoin)
+_DATA_PEN = QPen(QColor(250, 180, 50), 2.5, Qt.PenStyle.SolidLine,
+                 Qt.PenCapStyle.RoundCap, Qt.PenJoinStyle.RoundJoin)
+_UNCONNECTED_PEN = QPen(QColor(100, 100, 100), 2, Qt.PenStyle.SolidLine,
+                        Qt.PenCapStyle.RoundCap, Qt.PenJoinStyle.RoundJoin)
 
 
 class ConnectionLine(QGraphicsPathItem):
@@ -33,22 +41,57 @@ class ConnectionLine(QGraphicsPathItem):
         self.end_connector = end_connector
         self.temp_end_point = None
         
+        # Path rebuilt in place by update_path()
+        self._path = QPainterPath()
+        
         # Set appearance
-        self.setPen(QPen(QColor(100, 100, 100), 2, Qt.PenStyle.SolidLine, 
-                        Qt.PenCapStyle.RoundCap, Qt.PenJoinStyle.RoundJoin))
+        self._update_pen()
         self.setZValue(-1)  # Draw lines below blocks
+        self._update_cache_mode()
         
+        self._update_control_sides()
         self.update_path()
         
+    def _update_control_sides(self):
+        """Work out which side of each end the curve leaves from."""
+        # +1 pulls a control point to the right of its end, -1 to the left.
+        # Outputs sit on the right of a block and inputs on the left; a
+        # temporary end point behaves like an output.
+        self._start_side = 1 if self.start_connector and not self.start_connector.is_input else -1
+        self._end_side = -1 if self.end_connector and self.end_connector.is_input else 1
+        
+    def _update_cache_mode(self):
+        """Cache the rendered line once both of its ends are connectors."""
+        # A finished line keeps its shape while blocks are panned past or
+        # repainted around it; a line following the mouse changes every
+        # move, so caching it would only add a pixmap redraw per update
+        if self.end_connector:
+            self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
+        else:
+            self.setCacheMode(QGraphicsItem.CacheMode.NoCache)
+        
+    def _update_pen(self):
+        """Pick the pen for the type of the starting connector."""
+        if not self.start_connector:
+            self.setPen(_UNCONNECTED_PEN)
+        elif self.start_connector.connector_type == "flow":
+            self.setPen(_FLOW_PEN)
+        else:
+            self.setPen(_DATA_PEN)
+            
     def set_start_connector(self, connector):
         """Set the starting connector."""
         self.start_connector = connector
+        self._update_pen()
+        self._update_control_sides()
         self.update_path()
         
     def set_end_connector(self, connector):
         """Set the ending connector."""
         self.end_connector = connector
         self.temp_end_point = None
+        self._update_cache_mode()
+        self._update_control_sides()
         self.update_path()
         
     def set_temp_end_point(self, point):
@@ -58,62 +101,64 @@ class ConnectionLine(QGraphicsPathItem):
         
     def update_path(self):
         """Update the path of the connection line."""
-        path = QPainterPath()
-        
         # Get start point
         if self.start_connector:
-            start_pos = self.start_connector.scenePos()
-            start_point = QPointF(start_pos.x(), start_pos.y())
+            start_point = self.start_connector.scenePos()
         else:
             return
             
         # Get end point
         if self.end_connector:
-            end_pos = self.end_connector.scenePos()
-            end_point = QPointF(end_pos.x(), end_pos.y())
+            end_point = self.end_connector.scenePos()
         elif self.temp_end_point:
             end_point = self.temp_end_point
         else:
             return
             
-        # Draw a bezier curve
-        path.moveTo(start_point)
-        
-        # Calculate control points for the curve
-        dx = end_point.x() - start_point.x()
-        control_offset = min(abs(dx) * 0.5, 80)
-        
-        if self.start_connector and not self.start_connector.is_input:
-            # Output connector (on right side)
-            control1 = QPointF(start_point.x() + control_offset, start_point.y())
-        else:
-            # Input connector (on left side)
-            control1 = QPointF(start_point.x() - control_offset, start_point.y())
-            
-        if self.end_connector and self.end_connector.is_input:
-            # Input connector (on left side)
-            control2 = QPointF(end_point.x() - control_offset, end_point.y())
-        else:
-            # Output connector (on right side) or temporary point
-            control2 = QPointF(end_point.x() + control_offset, end_point.y())
-            
-        path.cubicTo(control1, control2, end_point)
+        # Work on plain coordinates; no intermediate points are allocated
+        start_x, start_y = start_point.x(), start_point.y()
+        end_x, end_y = end_point.x(), end_point.y()
+        
+        # Calculate control points for the curve, on each end's side
+        control_offset = min(abs(end_x - start_x) * 0.5, 80.0)
+        
+        # Draw a bezier curve, reusing the path object
+        path = self._path
+        path.clear()
+        path.moveTo(start_x, start_y)
+        path.cubicTo(
+            start_x + self._start_side * control_offset, start_y,
+            end_x + self._end_side * control_offset, end_y,
+            end_x, end_y
+        )
         self.setPath(path)
+
+
+class BlockScene(QGraphicsScene):
+    """
+    Scene holding the blocks and connections of a canvas.
+    """
+    
+    def __init__(self, parent=None):
+        """
+        Initialize a new block scene.
         
-    def paint(self, painter, option, widget):
-        """Paint the connection line."""
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        Args:
+            parent: Parent object
+        """
+        super().__init__(parent)
         
-        # Set color based on connection type
-        if self.start_connector:
-            if self.start_connector.connector_type == "flow":
-                self.setPen(QPen(QColor(50, 150, 250), 2.5, Qt.PenStyle.SolidLine, 
-                               Qt.PenCapStyle.RoundCap, Qt.PenJoinStyle.RoundJoin))
-            else:
-                self.setPen(QPen(QColor(250, 180, 50), 2.5, Qt.PenStyle.SolidLine, 
-                               Qt.PenCapStyle.RoundCap, Qt.PenJoinStyle.RoundJoin))
+        # Spatial index of connector positions for connection hit-testing
+        self.connector_index = ConnectorIndex()
+        
+        # Block currently raised to the front
+        self.top_block = None
         
-        super().paint(painter, option, widget)
+    def clear(self):
+        """Remove all items from the scene."""
+        super().clear()
+        self.connector_index.clear()
+        self.top_block = None
 
 
 class BlockCanvas(QGraphicsView):
@@ -136,13 +181,16 @@ class BlockCanvas(QGraphicsView):
         super().__init__(parent)
         
         # Set up the scene
-        self.scene = QGraphicsScene(self)
+        self.scene = BlockScene(self)
         self.scene.setSceneRect(-2000, -2000, 4000, 4000)
         self.setScene(self.scene)
         
         # Set view properties
         self.setRenderHint(QPainter.RenderHint.Antialiasing)
-        self.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.FullViewportUpdate)
+        # Repaint only what changed; the antialiasing margin stays adjusted so
+        # smooth edges just outside an item's bounds are repainted too
+        self.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.MinimalViewportUpdate)
+        self.setOptimizationFlag(QGraphicsView.OptimizationFlag.DontSavePainterState, True)
         self.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
         self.setResizeAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
         self.setDragMode(QGraphicsView.DragMode.RubberBandDrag)
@@ -151,10 +199,22 @@ class BlockCanvas(QGraphicsView):
         self.grid_size = 20
         self.grid_enabled = True
         
+        # Background brushes; the grid is one pre-drawn cell that Qt tiles
+        self._background_brush = QBrush(QColor(40, 40, 40))
+        self._grid_brush = self._create_grid_brush(self.grid_size)
+        
         # Connection handling
         self.temp_connection = None
         self.active_connector = None
         
+        # Latest mouse position for the temporary connection, applied once
+        # per event loop pass however many mouse moves arrive in between
+        self._pending_temp_pos = None
+        self._temp_timer = QTimer(self)
+        self._temp_timer.setSingleShot(True)
+        self._temp_timer.setInterval(0)
+        self._temp_timer.timeout.connect(self._apply_temp_pos)
+        
         # Zoom level
         self.zoom_level = 1.0
         self.min_zoom = 0.1
@@ -170,6 +230,9 @@ class BlockCanvas(QGraphicsView):
         # Dictionary of connections
         self.connections = {}
         
+        # Connection lines attached to each connector
+        self._connector_lines = {}
+        
     def add_block(self, block):
         """
         Add a block to the canvas.
@@ -181,6 +244,7 @@ class BlockCanvas(QGraphicsView):
             The added block
         """
         self.scene.addItem(block)
+        self.scene.connector_index.update_block(block)
         self.blocks[block.block_id] = block
         
         # Connect signals
@@ -188,10 +252,10 @@ class BlockCanvas(QGraphicsView):
         block.blockMoved.connect(self.on_block_moved)
         
         # Connect connector signals
-        for connector_id, connector in block.input_connectors.items():
+        for connector in block.input_connectors.values():
             connector.connectionChanged.connect(self.on_connection_changed)
             
-        for connector_id, connector in block.output_connectors.items():
+        for connector in block.output_connectors.values():
             connector.connectionChanged.connect(self.on_connection_changed)
             
         return block
@@ -204,16 +268,19 @@ class BlockCanvas(QGraphicsView):
             block: Block to remove
         """
         # Remove all connections to/from this block
-        for connector_id, connector in list(block.input_connectors.items()):
+        for connector in list(block.input_connectors.values()):
             if connector.connected_to:
                 self.delete_connection(connector, connector.connected_to)
                 
-        for connector_id, connector in list(block.output_connectors.items()):
+        for connector in list(block.output_connectors.values()):
             if connector.connected_to:
                 self.delete_connection(connector, connector.connected_to)
                 
         # Remove the block
         self.scene.removeItem(block)
+        self.scene.connector_index.remove_block(block)
+        if self.scene.top_block is block:
+            self.scene.top_block = None
         if block.block_id in self.blocks:
             del self.blocks[block.block_id]
             
@@ -234,6 +301,7 @@ class BlockCanvas(QGraphicsView):
         self.scene.clear()
         self.blocks = {}
         self.connections = {}
+        self._connector_lines = {}
         self.temp_connection = None
         self.active_connector = None
         
@@ -270,18 +338,11 @@ class BlockCanvas(QGraphicsView):
         """
         self.blockMoved.emit(block)
         
-        # Update connections
-        for connector_id, connector in block.input_connectors.items():
-            if connector.connected_to:
-                connection_id = self.get_connection_id(connector, connector.connected_to)
-                if connection_id in self.connections:
-                    self.connections[connection_id].update_path()
-                    
-        for connector_id, connector in block.output_connectors.items():
-            if connector.connected_to:
-                connection_id = self.get_connection_id(connector, connector.connected_to)
-                if connection_id in self.connections:
-                    self.connections[connection_id].update_path()
+        # Update the lines attached to the block's connectors
+        for connectors in (block.input_connectors, block.output_connectors):
+            for connector in connectors.values():
+                for connection in self._connector_lines.get(connector, ()):
+                    connection.update_path()
                     
     def on_connection_changed(self, connector, connected_to):
         """
@@ -308,7 +369,7 @@ class BlockCanvas(QGraphicsView):
             connector2: Second connector
             
         Returns:
-            The created connection line
+            The created connection line, or the existing one between the pair
         """
         # Determine which is input and which is output
         if connector1.is_input:
@@ -318,14 +379,24 @@ class BlockCanvas(QGraphicsView):
             input_connector = connector2
             output_connector = connector1
             
+        # Both connectors report a new connection, so the line may already
+        # exist; reuse it instead of stacking a duplicate on top
+        connection_id = self.get_connection_id(connector1, connector2)
+        existing = self.connections.get(connection_id)
+        if existing:
+            return existing
+            
         # Create a connection line
         connection = ConnectionLine(output_connector, input_connector)
         self.scene.addItem(connection)
         
         # Store the connection
-        connection_id = self.get_connection_id(connector1, connector2)
         self.connections[connection_id] = connection
         
+        # Index it under both of its connectors
+        self._connector_lines.setdefault(output_connector, []).append(connection)
+        self._connector_lines.setdefault(input_connector, []).append(connection)
+        
         # Emit signal
         self.connectionCreated.emit(output_connector, input_connector)
         
@@ -344,6 +415,7 @@ class BlockCanvas(QGraphicsView):
             connection = self.connections[connection_id]
             self.scene.removeItem(connection)
             del self.connections[connection_id]
+            self._unindex_connection(connection)
             
             # Disconnect the connectors
             if connector1.connected_to == connector2:
@@ -357,6 +429,20 @@ class BlockCanvas(QGraphicsView):
             else:
                 self.connectionDeleted.emit(connector1, connector2)
                 
+    def _unindex_connection(self, connection):
+        """
+        Remove a connection line from the per-connector index.
+        
+        Args:
+            connection: Connection line to remove
+        """
+        for connector in (connection.start_connector, connection.end_connector):
+            lines = self._connector_lines.get(connector)
+            if lines and connection in lines:
+                lines.remove(connection)
+                if not lines:
+                    del self._connector_lines[connector]
+                    
     def get_connection_id(self, connector1, connector2):
         """
         Get a unique ID for a connection between two connectors.
@@ -366,16 +452,17 @@ class BlockCanvas(QGraphicsView):
             connector2: Second connector
             
         Returns:
-            Unique connection ID
+            tuple: (block_id, connector_id, block_id, connector_id), ordered by
+            block ID so both directions give the same key
         """
         # Sort by parent block ID to ensure consistent IDs
         block1 = connector1.parentItem()
         block2 = connector2.parentItem()
         
         if block1.block_id < block2.block_id:
-            return f"{block1.block_id}.{connector1.connector_id}-{block2.block_id}.{connector2.connector_id}"
+            return (block1.block_id, connector1.connector_id, block2.block_id, connector2.connector_id)
         else:
-            return f"{block2.block_id}.{connector2.connector_id}-{block1.block_id}.{connector1.connector_id}"
+            return (block2.block_id, connector2.connector_id, block1.block_id, connector1.connector_id)
             
     def mousePressEvent(self, event):
         """Handle mouse press events."""
@@ -388,31 +475,32 @@ class BlockCanvas(QGraphicsView):
         elif event.button() == Qt.MouseButton.LeftButton:
             # Check if we're creating a connection
             if self.active_connector:
-                # Find item under cursor
+                # Find the nearest compatible connector under the cursor
+                active = self.active_connector
                 pos = self.mapToScene(event.position().toPoint())
-                items = self.scene.items(pos)
-                
-                for item in items:
-                    if isinstance(item, BlockConnector) and item != self.active_connector:
-                        # Check if connection is valid
-                        if self.active_connector.is_input != item.is_input:
-                            # Check connector types
-                            if self.active_connector.connector_type == item.connector_type:
-                                # Create connection
-                                if self.active_connector.is_input:
-                                    item.connect_to(self.active_connector)
-                                else:
-                                    self.active_connector.connect_to(item)
-                                    
-                                # Clean up temporary connection
-                                if self.temp_connection:
-                                    self.scene.removeItem(self.temp_connection)
-                                    self.temp_connection = None
-                                    
-                                self.active_connector = None
-                                event.accept()
-                                return
+                target = self.scene.connector_index.find_nearest(
+                    pos.x(), pos.y(), active.radius,
+                    accept=lambda item: (item is not active
+                                         and item.is_input != active.is_input
+                                         and item.connector_type_code == active.connector_type_code)
+                )
                 
+                if target:
+                    # Create connection
+                    if active.is_input:
+                        target.connect_to(active)
+                    else:
+                        active.connect_to(target)
+                        
+                    # Clean up temporary connection
+                    if self.temp_connection:
+                        self.scene.removeItem(self.temp_connection)
+                        self.temp_connection = None
+                        
+                    self.active_connector = None
+                    event.accept()
+                    return
+                    
                 # No valid connector found, cancel connection
                 if self.temp_connection:
                     self.scene.removeItem(self.temp_connection)
@@ -421,6 +509,10 @@ class BlockCanvas(QGraphicsView):
                 self.active_connector = None
                 event.accept()
             else:
+                # A press on empty space starts a rubber band, which sweeps
+                # the viewport; repaint it whole until the button is released
+                if self.itemAt(event.position().toPoint()) is None:
+                    self.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.FullViewportUpdate)
                 super().mousePressEvent(event)
         else:
             super().mousePressEvent(event)
@@ -441,13 +533,21 @@ class BlockCanvas(QGraphicsView):
             
             event.accept()
         elif self.active_connector and self.temp_connection:
-            # Update temporary connection line
-            pos = self.mapToScene(event.position().toPoint())
-            self.temp_connection.set_temp_end_point(pos)
+            # Update temporary connection line on the next event loop pass
+            self._pending_temp_pos = self.mapToScene(event.position().toPoint())
+            if not self._temp_timer.isActive():
+                self._temp_timer.start()
             event.accept()
         else:
             super().mouseMoveEvent(event)
             
+    def _apply_temp_pos(self):
+        """Move the temporary connection's end to the latest mouse position."""
+        pos = self._pending_temp_pos
+        self._pending_temp_pos = None
+        if pos is not None and self.temp_connection:
+            self.temp_connection.set_temp_end_point(pos)
+            
     def mouseReleaseEvent(self, event):
         """Handle mouse release events."""
         if event.button() == Qt.MouseButton.MiddleButton:
@@ -458,6 +558,10 @@ class BlockCanvas(QGraphicsView):
         else:
             super().mouseReleaseEvent(event)
             
+            # Go back to minimal updates once a rubber band is done
+            if event.button() == Qt.MouseButton.LeftButton:
+                self.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.MinimalViewportUpdate)
+            
     def wheelEvent(self, event):
         """Handle mouse wheel events for zooming."""
         # Calculate zoom factor
@@ -483,35 +587,40 @@ class BlockCanvas(QGraphicsView):
         else:
             super().keyPressEvent(event)
             
+    def _create_grid_brush(self, grid_size):
+        """
+        Create a brush that paints the background with grid lines.
+        
+        Args:
+            grid_size: Grid cell size in scene units
+            
+        Returns:
+            QBrush: Brush tiling a single grid cell
+        """
+        # One cell with its left and top grid lines
+        tile = QPixmap(grid_size, grid_size)
+        tile.fill(QColor(40, 40, 40))
+        
+        painter = QPainter(tile)
+        painter.setPen(QPen(QColor(60, 60, 60), 1))
+        painter.drawLine(0, 0, grid_size - 1, 0)
+        painter.drawLine(0, 0, 0, grid_size - 1)
+        painter.end()
+        
+        return QBrush(tile)
+        
     def drawBackground(self, painter, rect):
         """Draw the canvas background with grid."""
         super().drawBackground(painter, rect)
         
-        # Fill background
-        painter.fillRect(rect, QBrush(QColor(40, 40, 40)))
-        
-        # Draw grid if enabled
+        # Fill background, tiling the grid cell from the scene origin so the
+        # lines fall on multiples of the grid size
         if self.grid_enabled:
-            # Calculate grid spacing based on zoom level
-            effective_grid_size = self.grid_size
-            
-            # Get visible area
-            left = int(rect.left()) - (int(rect.left()) % effective_grid_size)
-            top = int(rect.top()) - (int(rect.top()) % effective_grid_size)
-            
-            # Create grid pen
-            grid_pen = QPen(QColor(60, 60, 60))
-            grid_pen.setWidth(1)
-            painter.setPen(grid_pen)
+            painter.setBrushOrigin(0, 0)
+            painter.fillRect(rect, self._grid_brush)
+        else:
+            painter.fillRect(rect, self._background_brush)
             
-            # Draw vertical lines
-            for x in range(left, int(rect.right()), effective_grid_size):
-                painter.drawLine(x, rect.top(), x, rect.bottom())
-                
-            # Draw horizontal lines
-            for y in range(top, int(rect.bottom()), effective_grid_size):
-                painter.drawLine(rect.left(), y, rect.right(), y)
-                
     def to_dict(self):
         """
         Convert canvas state to dictionary representation.
@@ -521,12 +630,12 @@ class BlockCanvas(QGraphicsView):
         """
         # Convert blocks
         blocks_data = []
-        for block_id, block in self.blocks.items():
+        for block in self.blocks.values():
             blocks_data.append(block.to_dict())
             
         # Convert connections
         connections_data = []
-        for connection_id, connection in self.connections.items():
+        for connection in self.connections.values():
             if connection.start_connector and connection.end_connector:
                 start_block = connection.start_connector.parentItem()
                 end_block = connection.end_connector.parentItem()
@@ -578,13 +687,13 @@ class BlockCanvas(QGraphicsView):
                 block.setPos(block_data.get("x", 0), block_data.get("y", 0))
                 
                 # Set properties
-                for prop_name, prop_value in block_data.get("properties", {}).items():
-                    block.set_property(prop_name, prop_value)
+                block.load_properties(block_data.get("properties", {}))
                     
                 # Add to canvas
                 self.add_block(block)
                 
-            # Create connections
+            # Collect connector pairs for the stored connections
+            pairs = []
             for conn_data in data.get("connections", []):
                 from_data = conn_data.get("from", {})
                 to_data = conn_data.get("to", {})
@@ -609,7 +718,10 @@ class BlockCanvas(QGraphicsView):
                 if not from_connector or not to_connector:
                     continue
                     
-                # Create connection
+                pairs.append((from_connector, to_connector))
+                
+            # Validate all pairs at once, then connect only the compatible ones
+            for from_connector, to_connector in validate_connections(pairs):
                 from_connector.connect_to(to_connector)
                 
             return True
@@ -353,8 +353,11 @@ class MainWindow(QMainWindow):
         # Build output signals
         self.build_output.buildFinished.connect(self.on_build_finished)
         
-        # Project signals
-        self.project.projectChanged.connect(self.on_project_changed)
+        # Project signals; queued so model changes return before the UI refreshes
+        self.project.projectChanged.connect(
+            self.on_project_changed,
+            Qt.ConnectionType.QueuedConnection
+        )
         
     def load_settings(self):
         """Load application settings."""
@@ -511,7 +514,7 @@ class MainWindow(QMainWindow):
             return self.save_project_as()
             
         # Update project data from canvas
-        self.project.set_canvas(self.canvas.to_dict())
+        self.project.set_canvas(self.canvas.to_dict(), owned=True)
         
         # Save project
         if not self.project.save():
@@ -548,7 +551,7 @@ class MainWindow(QMainWindow):
             file_path += '.fsp'
             
         # Update project data from canvas
-        self.project.set_canvas(self.canvas.to_dict())
+        self.project.set_canvas(self.canvas.to_dict(), owned=True)
         
         # Save project
         if not self.project.save(file_path):
@@ -634,7 +637,7 @@ class MainWindow(QMainWindow):
         app_id = manifest_data.get("appid", "flipper_app")
         
         # Update project data from canvas
-        self.project.set_canvas(self.canvas.to_dict())
+        self.project.set_canvas(self.canvas.to_dict(), owned=True)
         
         # Generate code
         try:
@@ -9,6 +9,11 @@ import json
 import shutil
 import tempfile
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 def ensure_directory_exists(directory):
     """
@@ -39,8 +44,14 @@ def read_json_file(file_path):
         dict: JSON data or None if file could not be read
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        # Read the whole file, then parse the raw bytes in one call, with
+        # orjson when installed
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+            
+        if orjson is not None:
+            return orjson.loads(raw)
+        return json.loads(raw)
     except Exception as e:
         print(f"Error reading JSON file {file_path}: {e}")
         return None
@@ -63,9 +74,15 @@ def write_json_file(file_path, data):
         if directory and not os.path.exists(directory):
             os.makedirs(directory, exist_ok=True)
             
-        # Write file
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        # Write file, serializing with orjson when installed; non-string keys
+        # become strings either way, as json.dumps does
+        if orjson is not None:
+            with open(file_path, 'wb') as f:
+                f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        else:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                # One write of the whole document, not one per token
+                f.write(json.dumps(data, indent=2, ensure_ascii=False))
             
         return True
     except Exception as e: